@@ -19,11 +19,8 @@ def main():
 
 
 if __name__ == '__main__':
-    if 'backup' in sys.argv:
-        from manage_db import backup_database
-        backup_database()
-    elif 'restore' in sys.argv:
-        from manage_db import restore_database
-        restore_database()
+    if sys.argv[1:2] in (['backup'], ['restore']):
+        from manage_db import main as manage_db
+        manage_db(sys.argv[1:])
     else:
         main()
@@ -1,57 +1,297 @@
+"""
+Streaming backup and restore of the whole database.
+
+    python manage.py backup [--dir backups] [--incremental] [--chunk-rows N]
+    python manage.py restore backups/<timestamp> [--workers 4] [--flush]
+
+A backup is a directory holding a manifest.json and, per table, gzipped
+JSON-lines chunks (one JSON array of column values per row). Rows are read
+with a server-side cursor inside one read-only snapshot, so memory stays
+bounded and the tables are consistent with each other.
+
+--incremental only dumps rows whose integer primary key is above the
+high-water mark of the previous backup in the same directory; tables with
+other keys are dumped in full. New rows are captured, later updates to old
+rows (e.g. a changed total_score) are not, so take full backups regularly.
+
+Restore follows an incremental backup back to its full base, then loads the
+tables in foreign-key order, each table's chunks in parallel with batched
+raw INSERTs that keep every stored value, created_at included. The target
+database must be migrated and empty; --flush empties it first.
+"""
+import argparse
+import gzip
+import json
 import os
-import dj_database_url
-from django.core.management import call_command
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-import sqlite3
-
-def backup_database():
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = f'db_backup_{timestamp}.json'
-    change_log = f'db_changes_{timestamp}.log'
-    
-    # Create JSON backup
-    call_command('dumpdata', output=backup_file)
-    
-    # Track changes by comparing table row counts
-    db_path = os.path.join(os.path.dirname(__file__), 'db.sqlite3')
-    
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        
-        # Get all tables
-        cursor.execute("SELECT name FROM sqlite_schema WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        with open(change_log, 'w') as f:
-            for table in tables:
-                table_name = table[0]
-                if table_name.startswith('sqlite_'):
-                    continue
-                    
-                # Get row count
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                row_count = cursor.fetchone()[0]
-                
-                f.write(f"Table: {table_name}, Rows: {row_count}\n")
-    
-    print(f"Database backup saved to {backup_file}")
-    print(f"Change log saved to {change_log}")
+
+MANIFEST = 'manifest.json'
+FETCH_SIZE = 2000
+INSERT_BATCH_SIZE = 1000
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_backend.settings')
+    import django
+    django.setup()
+
+
+def _models():
+    """Every table Django manages, parents before the tables that reference them."""
+    from django.apps import apps
+
+    models = [model for model in apps.get_models(include_auto_created=True)
+              if model._meta.managed and not model._meta.proxy]
+    ordered = []
+    remaining = list(models)
+    while remaining:
+        ready = [model for model in remaining
+                 if all(parent in ordered or parent is model or parent not in models
+                        for parent in _parents(model))]
+        # A reference cycle: the rest is loaded in any order.
+        ready = ready or remaining
+        ordered.extend(ready)
+        remaining = [model for model in remaining if model not in ready]
+    return ordered
+
+
+def _parents(model):
+    return {field.related_model for field in model._meta.concrete_fields if field.is_relation}
+
+
+@contextmanager
+def _snapshot(connection):
+    """Hold one read transaction so all tables are dumped as of the same moment."""
+    from django.db import transaction
+
+    if connection.vendor == 'sqlite':
+        # A deferred transaction: under WAL it does not block writers (a
+        # Django atomic block here would take the write lock, see
+        # quiz_backend/sqlite3/base.py).
+        with connection.cursor() as cursor:
+            cursor.execute('BEGIN')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('COMMIT')
+        return
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        yield
+
+
+def _latest_backup(directory):
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory)
+                   if os.path.exists(os.path.join(directory, name, MANIFEST)))
+    return os.path.join(directory, names[-1]) if names else None
+
+
+def _load_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def _json_default(value):
+    """DjangoJSONEncoder's types, without its cut of datetimes to milliseconds."""
+    from datetime import time
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    if isinstance(value, (datetime, time)):
+        return value.isoformat()
+    return DjangoJSONEncoder().default(value)
+
+
+def backup_database(directory='backups', incremental=False, chunk_rows=100000):
+    """Write a backup under `directory` and return its path."""
+    from django.db import connection
+
+    base = _latest_backup(directory) if incremental else None
+    base_tables = _load_manifest(base)['tables'] if base else {}
+    path = os.path.join(directory, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    os.makedirs(path)
+    encoder = json.JSONEncoder(separators=(',', ':'), default=_json_default)
+
+    tables = {}
+    with _snapshot(connection):
+        for model in _models():
+            table = model._meta.db_table
+            pk = model._meta.pk
+            columns = [field.attname for field in model._meta.concrete_fields]
+            high_water = base_tables.get(table, {}).get('high_water')
+            rows = model._base_manager.order_by(pk.attname)
+            if high_water is not None:
+                rows = rows.filter(pk__gt=high_water)
+
+            entry = {
+                'model': model._meta.label_lower,
+                'columns': columns,
+                'mode': 'incremental' if high_water is not None else 'full',
+                'rows': 0,
+                'chunks': [],
+                'high_water': high_water,
+            }
+            pk_index = columns.index(pk.attname)
+            integer_pk = pk.get_internal_type() in ('AutoField', 'BigAutoField', 'SmallAutoField',
+                                                    'IntegerField', 'BigIntegerField')
+            out = None
+            for values in rows.values_list(*columns).iterator(chunk_size=FETCH_SIZE):
+                if out is None or entry['rows'] % chunk_rows == 0:
+                    if out is not None:
+                        out.close()
+                    chunk = os.path.join(table, f"{len(entry['chunks']):05d}.jsonl.gz")
+                    os.makedirs(os.path.join(path, table), exist_ok=True)
+                    out = gzip.open(os.path.join(path, chunk), 'wt', encoding='utf-8')
+                    entry['chunks'].append(chunk)
+                out.write(encoder.encode(values))
+                out.write('\n')
+                entry['rows'] += 1
+                if integer_pk:
+                    entry['high_water'] = values[pk_index]
+            if out is not None:
+                out.close()
+            if not integer_pk:
+                entry['high_water'] = None
+            tables[table] = entry
+
+    manifest = {
+        'created': datetime.now().isoformat(),
+        'kind': 'incremental' if base else 'full',
+        'base': os.path.basename(base) if base else None,
+        'tables': tables,
+    }
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    for table, entry in tables.items():
+        print(f"{table}: {entry['rows']} rows ({entry['mode']})")
+    print(f"Database backup saved to {path}")
+    return path
+
+
+def _chain(path):
+    """The backups to apply for `path`, oldest (its full base) first."""
+    chain = []
+    while path:
+        manifest = _load_manifest(path)
+        chain.append((path, manifest))
+        path = os.path.join(os.path.dirname(path), manifest['base']) if manifest['base'] else None
+    return chain[::-1]
+
+
+def _load_chunk(model, columns, chunk_path):
+    from django.db import connection, connections, transaction
+
+    fields = model._meta.concrete_fields
+    by_column = {field.attname: field for field in fields}
+    batch_size = min(INSERT_BATCH_SIZE, connection.ops.bulk_batch_size(fields, [None] * INSERT_BATCH_SIZE))
+
+    def insert(batch):
+        # A raw insert, unlike bulk_create(), skips Field.pre_save(), which
+        # would stamp auto_now(_add) columns with the time of the restore.
+        model._base_manager._insert(batch, fields=fields, raw=True)
+        return len(batch)
+
+    try:
+        rows = 0
+        batch = []
+        with transaction.atomic(), gzip.open(chunk_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                # Columns dropped since the backup was taken are skipped, ones
+                # added since get their defaults.
+                batch.append(model(**{column: by_column[column].to_python(value)
+                                      for column, value in zip(columns, json.loads(line)) if column in by_column}))
+                if len(batch) >= batch_size:
+                    rows += insert(batch)
+                    batch = []
+            if batch:
+                rows += insert(batch)
+        return rows
+    finally:
+        connections.close_all()
+
+
+def restore_database(path, workers=4, flush=False):
+    from django.apps import apps
+    from django.core.management import call_command
+    from django.core.management.color import no_style
+    from django.db import connection
+
+    chunks = {}  # table -> [(columns, chunk path)]
+    for backup, manifest in _chain(path.rstrip(os.sep)):
+        for table, entry in manifest['tables'].items():
+            files = [(entry['columns'], os.path.join(backup, chunk)) for chunk in entry['chunks']]
+            if entry['mode'] == 'full':
+                chunks[table] = files
+            else:
+                chunks.setdefault(table, []).extend(files)
+
+    if flush:
+        # Without post_migrate, so content types and permissions are not
+        # recreated with ids that clash with the backup's.
+        call_command('flush', interactive=False, inhibit_post_migrate=True, verbosity=0)
+    models = [model for model in _models() if model._meta.db_table in chunks]
+    not_empty = [model._meta.db_table for model in models if model._base_manager.exists()]
+    if not_empty:
+        raise SystemExit(f"Refusing to restore into non-empty tables ({', '.join(not_empty)}); "
+                         f"use --flush to empty the database first.")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for model in models:
+            # Tables go one after another so every row's parents are
+            # committed before it is inserted; a table's chunks go in parallel.
+            files = chunks[model._meta.db_table]
+            rows = sum(pool.map(lambda item: _load_chunk(model, *item), files))
+            print(f"{model._meta.db_table}: {rows} rows")
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+    if apps.is_installed('quiz_api'):
+        from quiz_api import question_bank
+        question_bank.invalidate()
+    print(f"Database restored from {path}")
+
 
 def schedule_backups():
     import schedule
     import time
-    
-    # Schedule daily backups at 2 AM
-    schedule.every().day.at("02:00").do(backup_database)
-    
+
+    # Full backup weekly, incremental backups every night at 2 AM
+    schedule.every().sunday.at("01:00").do(backup_database)
+    schedule.every().day.at("02:00").do(backup_database, incremental=True)
+
     while True:
         schedule.run_pending()
         time.sleep(1)
 
-def restore_database():
-    backup_file = 'db_backup.sql'
-    if os.path.exists(backup_file):
-        call_command('loaddata', backup_file)
-        print(f"Database restored from {backup_file}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming database backup and restore.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    backup = commands.add_parser('backup')
+    backup.add_argument('--dir', default=os.getenv('BACKUP_DIR', 'backups'))
+    backup.add_argument('--incremental', action='store_true')
+    backup.add_argument('--chunk-rows', type=int, default=100000)
+    restore = commands.add_parser('restore')
+    restore.add_argument('path', help="A backup directory, e.g. backups/20240101_020000.")
+    restore.add_argument('--workers', type=int, default=4)
+    restore.add_argument('--flush', action='store_true', help="Empty the database before restoring.")
+    options = parser.parse_args(argv)
+
+    _setup_django()
+    if options.command == 'backup':
+        backup_database(options.dir, options.incremental, options.chunk_rows)
     else:
-        print("Backup file not found")
\ No newline at end of file
+        restore_database(options.path, options.workers, options.flush)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,19 +1,35 @@
-from django.contrib import admin
-from .models import Student, Question, StudentAnswer, Leaderboard
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.db.models.functions import Substr
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from . import question_io
+from .admin_paging import KeysetPaginationMixin
+from .models import Student, Question, StudentAnswer, Leaderboard, CodeJob, ResultNotification
 
 # Register your models here.
 
+# Characters of question text shown in list columns.
+PREVIEW_LENGTH = 80
+
+
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'email', 'total_score')
-    ordering = ('-total_score',)
+    # Matches student_score_rank_idx, so pages are index range scans.
+    keyset = ordering = ('-total_score', 'id')
     search_fields = ('name', 'email')
 
 
 @admin.register(Leaderboard)
-class LeaderboardAdmin(admin.ModelAdmin):
+class LeaderboardAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'email', 'total_score')
-    ordering = ('-total_score',)
+    keyset = ordering = ('-total_score', 'id')
 
     # Optional: make fields read-only so no one changes them in the Leaderboard view
     readonly_fields = ('id','name', 'email', 'department', 'college', 'year', 'total_score')
@@ -26,19 +42,106 @@ class LeaderboardAdmin(admin.ModelAdmin):
         return False
 
 
+class QuestionImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or JSON lines, as written by the export actions.")
+    dry_run = forms.BooleanField(required=False, help_text="Only validate and count.")
+
+
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('text', 'correct_option')
+    list_display = ('short_text', 'category', 'correct_option')
+    list_filter = ('category',)
+    change_list_template = 'admin/quiz_api/question/change_list.html'
+    actions = ['export_csv', 'export_jsonl']
     fieldsets = (
         ('General', {
-            'fields': ('text', 'code_snippet')
+            'fields': ('text', 'code_snippet', 'category')
         }),
         ('Options', {
             'fields': ('option_a', 'option_b', 'option_c', 'option_d', 'correct_option')
         }),
     )
 
+    @admin.display(description='Text', ordering='text')
+    def short_text(self, obj):
+        return str(obj)
+
+    def get_urls(self):
+        view = self.admin_site.admin_view(self.import_view)
+        return [path('import/', view, name='quiz_api_question_import')] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:quiz_api_question_changelist')
+        form = QuestionImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = question_io.guess_format(upload.name)
+            if fmt is None:
+                form.add_error('file', "Use a .csv or .jsonl file.")
+            else:
+                lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+                try:
+                    result = question_io.import_questions(lines, fmt, dry_run=form.cleaned_data['dry_run'])
+                except question_io.ImportFailed as e:
+                    for line, message in e.errors:
+                        form.add_error('file', f"Line {line}: {message}")
+                except UnicodeDecodeError:
+                    form.add_error('file', "The file is not UTF-8 text.")
+                else:
+                    verb = "Would import" if form.cleaned_data['dry_run'] else "Imported"
+                    self.message_user(request, f"{verb} {result['created']} questions, "
+                                               f"skipped {result['duplicates']} duplicates.", messages.SUCCESS)
+                    return redirect('admin:quiz_api_question_changelist')
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta, 'form': form,
+                   'title': "Import questions"}
+        return TemplateResponse(request, 'admin/quiz_api/question/import.html', context)
+
+    def _export(self, queryset, fmt):
+        response = StreamingHttpResponse(
+            question_io.export_questions(fmt, queryset),
+            content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="questions.{fmt}"'
+        return response
+
+    @admin.action(description="Export selected questions as CSV")
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description="Export selected questions as JSON lines")
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
 
 @admin.register(StudentAnswer)
-class StudentAnswerAdmin(admin.ModelAdmin):
-    list_display = ('student', 'question', 'chosen_option', 'is_correct')
+class StudentAnswerAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ('id', 'student', 'question_preview', 'chosen_option', 'is_correct')
+    list_select_related = ('student',)
+    keyset = ordering = ('-id',)
+    # Select widgets would load every student and question.
+    raw_id_fields = ('student', 'question')
+
+    def get_queryset(self, request):
+        # Only the start of the question text leaves the database.
+        return (super().get_queryset(request)
+                .defer('student__department', 'student__college', 'student__year')
+                .annotate(question_preview=Substr('question__text', 1, PREVIEW_LENGTH)))
+
+    @admin.display(description='Question')
+    def question_preview(self, obj):
+        return obj.question_preview
+
+
+@admin.register(CodeJob)
+class CodeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'language', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'language')
+    readonly_fields = ('id', 'language', 'code', 'status', 'output', 'created_at', 'started_at', 'finished_at')
+
+
+@admin.register(ResultNotification)
+class ResultNotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient',)
@@ -0,0 +1,156 @@
+"""
+Admin change lists that stay fast on tables with 100k+ rows.
+
+A ModelAdmin with KeysetPaginationMixin and a `keyset` ordering (e.g.
+('-total_score', 'id'), backed by an index and ending in a unique field)
+pages with a WHERE on the last row seen instead of OFFSET, so the 500th page
+costs what the first does. Pages are linked as First/Previous/Next through
+the `after`/`before` query parameters. Once the user sorts by another column
+the list falls back to Django's numbered pages.
+
+Either way nothing runs a full COUNT(*): unfiltered lists show an estimate
+from the table's statistics, filtered ones count at most COUNT_LIMIT rows.
+"""
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+COUNT_LIMIT = 10000
+
+
+def _table_estimate(queryset):
+    """Rows in the queryset's table by the database's statistics, or None."""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+        # -1 until the table has been vacuumed or analyzed.
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite' and queryset.model._meta.pk.get_internal_type() in ('AutoField',
+                                                                                        'BigAutoField'):
+        # The highest id, one b-tree descent; deleted rows make it an overestimate.
+        return queryset.model._base_manager.using(queryset.db).aggregate(n=Max('pk'))['n'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A Paginator whose count is estimated (unfiltered) or capped at COUNT_LIMIT (filtered)."""
+
+    # '' when count is exact, otherwise how to qualify it: 'about' or 'over'.
+    count_qualifier = ''
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = _table_estimate(queryset)
+            if estimate is not None:
+                self.count_qualifier = 'about'
+                return estimate
+        count = queryset[:COUNT_LIMIT + 1].count()
+        if count > COUNT_LIMIT:
+            self.count_qualifier = 'over'
+            return COUNT_LIMIT
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    keyset_active = False
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(AFTER_VAR, None)
+        params.pop(BEFORE_VAR, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Sorting and filtering start from the first page again.
+        return super().get_query_string(new_params, [*(remove or ()), AFTER_VAR, BEFORE_VAR])
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            super().get_results(request)
+            self.count_qualifier = self.paginator.count_qualifier
+            return
+
+        keyset = self.model_admin.keyset
+        per_page = self.list_per_page
+        after, before = self.params.get(AFTER_VAR), self.params.get(BEFORE_VAR)
+        queryset = self.queryset
+        if before is not None:
+            reverse = [name[1:] if name.startswith('-') else f'-{name}' for name in keyset]
+            rows = list(queryset.filter(self._past(reverse, self._decode(before))).order_by(*reverse)[:per_page + 1])
+            has_previous, has_next = len(rows) > per_page, True
+            rows = rows[:per_page][::-1]
+        else:
+            if after is not None:
+                queryset = queryset.filter(self._past(keyset, self._decode(after)))
+            rows = list(queryset.order_by(*keyset)[:per_page + 1])
+            has_previous, has_next = after is not None, len(rows) > per_page
+            rows = rows[:per_page]
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, per_page)
+        self.result_count = self.paginator.count
+        self.count_qualifier = self.paginator.count_qualifier
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        # A list, not a queryset: not for admins with list_editable.
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_previous or has_next
+        self.keyset_active = True
+        self.first_url = self.get_query_string() if has_previous else None
+        self.previous_url = has_previous and rows and self.get_query_string({BEFORE_VAR: self._encode(rows[0])})
+        self.next_url = has_next and rows and self.get_query_string({AFTER_VAR: self._encode(rows[-1])})
+
+    def _fields(self):
+        return [self.opts.get_field(name.lstrip('-')) for name in self.model_admin.keyset]
+
+    def _encode(self, obj):
+        return json.dumps([getattr(obj, field.attname) for field in self._fields()], cls=DjangoJSONEncoder)
+
+    def _decode(self, cursor):
+        try:
+            values = json.loads(cursor)
+            if not isinstance(values, list) or len(values) != len(self._fields()):
+                raise ValueError(cursor)
+            return [field.to_python(value) for field, value in zip(self._fields(), values)]
+        except (TypeError, ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e) from e
+
+    @staticmethod
+    def _past(ordering, values):
+        """Q for the rows after `values` in `ordering`: (a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            condition |= equal & Q(**{f"{field}__{'lt' if name.startswith('-') else 'gt'}": value})
+            equal &= Q(**{field: value})
+        # Redundant, but lets the database seek the index to the cursor
+        # instead of filtering from its start.
+        first = ordering[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & condition
+
+
+class KeysetPaginationMixin:
+    """ModelAdmin mixin; set `keyset` to an indexed ordering whose last field is unique."""
+    keyset = ('-id',)
+    paginator = EstimatedCountPaginator
+    # The "N of M selected" total would be another full COUNT(*).
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
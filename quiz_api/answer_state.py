@@ -0,0 +1,88 @@
+"""
+Cached answer state for the submit_answer hot path.
+
+A student answers a quiz's questions one request after another, so each
+student's answered set ({question_id: (chosen_option, is_correct)}) is kept
+in the ANSWER_STATE_CACHE cache instead of being re-read on every
+submission; the answer key comes from question_bank.answer_key(). The
+default backend is process-local memory; any Django cache backend can be
+configured instead.
+
+The cache is never trusted for the write itself: scoring.submit_answer
+writes with a condition on the state it graded against and reloads from the
+database when that condition fails, so a stale entry (another worker
+process, an admin edit) costs a retry, never a wrong score.
+
+Entries are dropped when StudentAnswers change through the ORM (see
+signals.py); bulk updates bypass those signals, so call forget() after them.
+
+The questions drawn for a student's quiz session (see quiz_sets.py) are
+cached here too, so submissions are checked against them without a query.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import QuizSession, Student, StudentAnswer
+
+
+def _cache():
+    return caches[settings.ANSWER_STATE_CACHE]
+
+
+def _student_key(student_id):
+    return f'student:{student_id}:answers'
+
+
+def _quiz_key(student_id):
+    return f'student:{student_id}:quiz'
+
+
+def answered(student_id, refresh=False):
+    """
+    The student's answers so far, from the cache unless `refresh` is set.
+
+    Raises Student.DoesNotExist for an unknown student. The result is not
+    cached here; callers store() it once their write has committed.
+    """
+    answers = None if refresh else _cache().get(_student_key(student_id))
+    if answers is None:
+        if not Student.objects.filter(id=student_id).exists():
+            raise Student.DoesNotExist(f"Student {student_id} not found")
+        answers = {question_id: (chosen_option, is_correct) for question_id, chosen_option, is_correct in
+                   StudentAnswer.objects.filter(student_id=student_id)
+                   .values_list('question_id', 'chosen_option', 'is_correct')}
+    return answers
+
+
+def store(student_id, answers):
+    _cache().set(_student_key(student_id), answers, settings.ANSWER_STATE_TTL)
+
+
+def forget(student_id):
+    _cache().delete(_student_key(student_id))
+
+
+def question_set(student_id):
+    """
+    The ids of the questions drawn for the student, or None if they have no quiz session.
+
+    "No session" is not cached: with a process-local cache, another worker
+    would go on letting the student answer any question after they started
+    a quiz through this one.
+    """
+    question_ids = _cache().get(_quiz_key(student_id))
+    if question_ids is None:
+        row = QuizSession.objects.filter(student_id=student_id).values_list('question_ids', flat=True).first()
+        if row is None:
+            return None
+        question_ids = frozenset(QuizSession.parse_ids(row))
+        _cache().set(_quiz_key(student_id), question_ids, settings.ANSWER_STATE_TTL)
+    return question_ids
+
+
+def store_question_set(student_id, question_ids):
+    _cache().set(_quiz_key(student_id), frozenset(question_ids), settings.ANSWER_STATE_TTL)
+
+
+def forget_question_set(student_id):
+    _cache().delete(_quiz_key(student_id))
@@ -0,0 +1,140 @@
+"""
+Async versions of the hot quiz endpoints, for serving under ASGI.
+
+DRF 3.14 has no async views, so these are plain Django coroutines that
+accept and return JSON and mirror the responses of their counterparts in
+views.py. Reads use Django's async ORM. Work that must stay transactional
+(scoring) or that runs in the warm sandbox pools is done in one
+sync_to_async hop, so the event loop is never blocked and the sync
+implementations remain the single source of truth.
+
+Async views cannot run inside ATOMIC_REQUESTS, so every view here is marked
+non-atomic.
+"""
+import functools
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.middleware.gzip import GZipMiddleware
+
+from . import leaderboard as ranking
+from . import live_leaderboard
+from . import question_bank
+from . import scoring
+from .models import Question, Student
+from .sandbox import SandboxBusy, run_submission
+from .views import _event_stream, _leaderboard_params, _sse, _with_next_link, questions_response
+
+
+# Only process_response() is used.
+_gzip = GZipMiddleware(lambda request: None)
+
+
+def async_api(methods):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        # csrf_exempt() in this Django version would wrap the coroutine in a
+        # sync function; set the flag it sets directly instead.
+        wrapper.csrf_exempt = True
+        return transaction.non_atomic_requests(wrapper)
+    return decorator
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@async_api(['GET'])
+async def get_questions(request):
+    payload, etag = await question_bank.aget_payload()
+    return questions_response(request, payload, etag)
+
+
+@async_api(['POST'])
+async def submit_answer(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    chosen_option = data.get('chosen_option')
+    if not isinstance(chosen_option, str) or not chosen_option:
+        return JsonResponse({'error': 'chosen_option is required'}, status=400)
+
+    try:
+        is_correct, current_score = await sync_to_async(scoring.submit_answer)(
+            data.get('student_id'), data.get('question_id'), chosen_option)
+    except (Student.DoesNotExist, Question.DoesNotExist) as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'student_id and question_id must be integers'}, status=400)
+
+    return JsonResponse({'is_correct': is_correct, 'current_score': current_score})
+
+
+@async_api(['GET'])
+async def leaderboard(request):
+    try:
+        limit, offset, fields, after = _leaderboard_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    rows, cursor = await ranking.atop(limit, offset, fields, after)
+    response = _with_next_link(request, HttpResponse(ranking.encode(rows), content_type='application/json'), cursor)
+    # gzip_page cannot wrap a coroutine in this Django version.
+    return _gzip.process_response(request, response)
+
+
+@async_api(['GET'])
+async def leaderboard_stream(request):
+    """
+    Server-Sent Events: a `snapshot` of the top of the board, then a `delta`
+    with the changed rows and removed ids whenever scores move.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would be buffered until it ends.
+        return JsonResponse({'error': 'The live leaderboard needs the ASGI server'}, status=501)
+
+    async def events():
+        deadline = time.monotonic() + settings.LEADERBOARD_STREAM_SECONDS
+        # Django 4.2 does not notice a client that went away mid-stream, so
+        # the deadline is also what eventually frees the subscription.
+        async for event in live_leaderboard.feed.subscribe():
+            yield ': keepalive\n\n' if event is None else _sse(*event)
+            if time.monotonic() > deadline:
+                return
+
+    return _event_stream(request, events())
+
+
+@async_api(['POST'])
+async def compile_code(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    code = data.get('code', '')
+    language = data.get('language', 'python')
+    if not code:
+        return JsonResponse({'error': 'No code provided'}, status=400)
+
+    try:
+        # Not thread-sensitive: runs may proceed in parallel threads, bounded
+        # by the sandbox pool's own admission control.
+        result, usage = await sync_to_async(run_submission, thread_sensitive=False)(code, language)
+    except SandboxBusy as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '2'
+        return response
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({'output': result, 'usage': usage})
@@ -0,0 +1,134 @@
+"""
+Leaderboard queries backed by the (-total_score, id) index on Student.
+
+Pages are read straight off the index instead of sorting the whole table.
+A rank is 1 + the number of students with a strictly higher score, so tied
+students share a rank; counting them walks the index range above the score,
+which costs O(rank), as does skipping rows with OFFSET. Deep pages are
+therefore read by keyset instead: every full page comes with a cursor
+("score,id,rank,position" of its last row), and the page after it is a
+WHERE on (total_score, id) that seeks straight to that row, with ranks
+carried on from the cursor instead of counted. OFFSET pages are kept for the
+first LEADERBOARD_MAX_OFFSET rows; a single student's rank (rank_of) is
+still a count.
+
+Pages are plain dicts of the requested columns (FIELDS; email is never
+exposed), fetched with .values() and encoded with json.dumps, since the
+model serializer dominated request time on large pages.
+"""
+import json
+
+from django.db.models import Q
+
+from . import metrics
+from .models import Student
+
+ORDERING = ('-total_score', 'id')
+
+# Columns a client may ask for with ?fields=, and the default selection.
+FIELDS = ('id', 'name', 'total_score', 'rank', 'department', 'college', 'year')
+DEFAULT_FIELDS = ('id', 'name', 'total_score', 'rank')
+
+
+def parse_fields(value):
+    """Turn a ?fields= value into a tuple of FIELDS; ValueError if unknown."""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown leaderboard fields: {', '.join(unknown) or value}. "
+                         f"Choose from {', '.join(FIELDS)}.")
+    return fields
+
+
+def parse_cursor(value):
+    """Turn an ?after= value into (score, id, rank, position); ValueError if malformed."""
+    cursor = tuple(int(part) for part in value.split(','))
+    if len(cursor) != 4:
+        raise ValueError(value)
+    return cursor
+
+
+def encode(rows):
+    with metrics.span('serialize'):
+        return json.dumps(rows, separators=(',', ':')).encode()
+
+
+def rank_for_score(score):
+    return Student.objects.filter(total_score__gt=score).count() + 1
+
+
+async def arank_for_score(score):
+    return await Student.objects.filter(total_score__gt=score).acount() + 1
+
+
+def _columns(fields):
+    # id and total_score are always fetched: ranks and cursors are computed from them.
+    return [field for field in fields if field not in ('id', 'rank', 'total_score')] + ['id', 'total_score']
+
+
+def _assign_ranks(rows, limit, start, first_rank, fields):
+    previous = None
+    cursor = None
+    for position, row in enumerate(rows, start=start):
+        if previous is None:
+            rank = first_rank
+        elif row['total_score'] == previous[0]:
+            rank = previous[1]
+        else:
+            rank = position
+        previous = (row['total_score'], rank)
+        cursor = f"{row['total_score']},{row['id']},{rank},{position}"
+        if 'rank' in fields:
+            row['rank'] = rank
+        for field in ('id', 'total_score'):
+            if field not in fields:
+                del row[field]
+    return rows, cursor if len(rows) == limit else None
+
+
+def _page(limit, offset, fields, after):
+    rows = Student.objects.order_by(*ORDERING).values(*_columns(fields))
+    if after is None:
+        return rows[offset:offset + limit]
+    score, student_id = after[:2]
+    # The redundant total_score__lte lets the database seek the index to the
+    # cursor instead of filtering from its start.
+    return rows.filter(Q(total_score__lt=score) | Q(total_score=score, id__gt=student_id),
+                       total_score__lte=score)[:limit]
+
+
+def _first_rank(rows, offset, after):
+    """The first row's rank if it is known without a count, else None."""
+    if after is not None:
+        # Ties may continue from the previous page.
+        return after[2] if rows and rows[0]['total_score'] == after[0] else after[3] + 1
+    return 1 if offset == 0 or not rows else None
+
+
+def top(limit, offset=0, fields=DEFAULT_FIELDS, after=None):
+    """
+    Return one leaderboard page as (list of dicts with the given fields,
+    cursor for the next page or None). `after` is a parsed cursor; it
+    overrides `offset`.
+    """
+    rows = list(_page(limit, offset, fields, after))
+    first_rank = _first_rank(rows, offset, after)
+    if first_rank is None:
+        # Ties may continue from the previous page, so ask the index.
+        first_rank = rank_for_score(rows[0]['total_score'])
+    return _assign_ranks(rows, limit, after[3] + 1 if after else offset + 1, first_rank, fields)
+
+
+async def atop(limit, offset=0, fields=DEFAULT_FIELDS, after=None):
+    """Async version of top()."""
+    rows = [row async for row in _page(limit, offset, fields, after)]
+    first_rank = _first_rank(rows, offset, after)
+    if first_rank is None:
+        first_rank = await arank_for_score(rows[0]['total_score'])
+    return _assign_ranks(rows, limit, after[3] + 1 if after else offset + 1, first_rank, fields)
+
+
+def rank_of(student):
+    return rank_for_score(student.total_score)
@@ -0,0 +1,123 @@
+"""
+Live leaderboard for /api/async/leaderboard/stream/ (Server-Sent Events).
+
+Score changes only call notify(), from any thread, once their transaction
+has committed. A broadcaster task on the ASGI event loop wakes every
+LEADERBOARD_LIVE_TICK seconds and, if anything changed, reads the top
+LEADERBOARD_LIVE_SIZE rows once and sends every subscriber the rows that
+differ from the previous board. A burst of answers within a tick therefore
+costs one query and one diff, however many subscribers are connected.
+
+The pub/sub is per process: notify() only reaches subscribers of the same
+worker. Every LEADERBOARD_LIVE_RESYNC seconds the board is re-read anyway,
+so changes made by other workers arrive within that delay.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+
+from . import leaderboard as ranking
+
+FIELDS = ranking.DEFAULT_FIELDS
+
+# Events a subscriber may fall behind by before its stream is closed; the
+# client reconnects and starts again from a snapshot.
+MAX_PENDING = 100
+
+CLOSE = object()
+
+
+class LeaderboardFeed:
+    def __init__(self, size, tick, resync):
+        self.size = size
+        self.tick = tick
+        self.resync = resync
+        self._changed = threading.Event()
+        self._loop = None
+
+    def _reset(self, loop):
+        # State is bound to one event loop (tests run several in turn).
+        self._loop = loop
+        self._lock = asyncio.Lock()
+        self._subscribers = set()
+        self._rows = None  # {student id: row} as last sent
+        self._version = 0
+        self._task = None
+
+    def notify(self):
+        """Mark the board as changed; safe to call from any thread."""
+        self._changed.set()
+
+    async def subscribe(self, keepalive=15):
+        """
+        Yield ('snapshot', data) with the current board, then ('delta', data)
+        for every change, or None after `keepalive` idle seconds.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._reset(loop)
+        queue = asyncio.Queue(MAX_PENDING)
+        async with self._lock:
+            if self._rows is None:
+                self._rows = await self._read()
+            snapshot = {'version': self._version, 'board': list(self._rows.values())}
+            self._subscribers.add(queue)
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+        try:
+            yield 'snapshot', snapshot
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is CLOSE:
+                    return
+                yield event
+        finally:
+            self._subscribers.discard(queue)
+
+    async def _read(self):
+        rows, _ = await ranking.atop(self.size, 0, FIELDS)
+        return {row['id']: row for row in rows}
+
+    async def _run(self):
+        idle = 0.0
+        while self._subscribers:
+            await asyncio.sleep(self.tick)
+            idle += self.tick
+            if not self._changed.is_set() and idle < self.resync:
+                continue
+            self._changed.clear()
+            idle = 0.0
+            async with self._lock:
+                self._publish(await self._read())
+        # Nobody is listening; the next subscriber starts from a fresh read.
+        self._rows = None
+        self._task = None
+
+    def _publish(self, rows):
+        updated = [row for student_id, row in rows.items() if self._rows.get(student_id) != row]
+        removed = [student_id for student_id in self._rows if student_id not in rows]
+        self._rows = rows
+        if not updated and not removed:
+            return
+        self._version += 1
+        event = ('delta', {'version': self._version, 'updated': updated, 'removed': removed})
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(CLOSE)
+
+
+feed = LeaderboardFeed(settings.LEADERBOARD_LIVE_SIZE, settings.LEADERBOARD_LIVE_TICK,
+                       settings.LEADERBOARD_LIVE_RESYNC)
+
+
+def notify():
+    feed.notify()
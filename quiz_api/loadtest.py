@@ -0,0 +1,46 @@
+"""
+Latency bookkeeping shared by the load-test and benchmark commands.
+"""
+import math
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(name, latencies, elapsed, errors=0, **extra):
+    """Summary row for one scenario; latencies are in seconds."""
+    values = sorted(latencies)
+    row = {
+        'name': name,
+        'requests': len(values),
+        'errors': errors,
+        'rps': len(values) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': (values[-1] if values else 0.0) * 1000,
+    }
+    row.update(extra)
+    return row
+
+
+def format_table(rows):
+    if not rows:
+        return ''
+    columns = list(rows[0])
+    cells = [[_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines += ['  '.join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells]
+    return '\n'.join(lines)
+
+
+def _cell(value):
+    if isinstance(value, float):
+        return f'{value:.1f}'
+    return '' if value is None else str(value)
@@ -0,0 +1,102 @@
+"""
+Outbox dispatcher for result emails.
+
+complete_quiz only inserts a ResultNotification; dispatch_pending() (run by
+the process_tasks worker) sends due notifications in batches over a single
+SMTP connection. A failed send is retried with exponential backoff until
+MAIL_MAX_ATTEMPTS is reached, after which the row is marked failed.
+
+Rows are claimed by pushing next_attempt_at forward to a lease deadline, so
+several workers can dispatch at once, and rows held by a worker that died
+become due again when the lease runs out.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ResultNotification
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+
+
+def queue_result_email(student, score):
+    return ResultNotification.objects.create(
+        student=student,
+        recipient=student.email,
+        subject="Your Quiz Results",
+        body=f"Hello {student.name},\n\nThank you for completing the quiz! Your final score is {score}.",
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before retry number `attempts`: base, 2x base, 4x base, ..."""
+    return timedelta(seconds=settings.MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    due = list(ResultNotification.objects
+               .filter(status=ResultNotification.PENDING, next_attempt_at__lte=now)
+               .order_by('next_attempt_at')
+               .values_list('id', flat=True)[:batch_size])
+    if not due:
+        return []
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    ResultNotification.objects.filter(
+        id__in=due, status=ResultNotification.PENDING, next_attempt_at__lte=now,
+    ).update(next_attempt_at=lease_until, attempts=F('attempts') + 1)
+    return list(ResultNotification.objects.filter(id__in=due, next_attempt_at=lease_until))
+
+
+def dispatch_pending(batch_size=None):
+    """Send one batch of due notifications; returns (sent, failed) counts."""
+    batch = _claim(batch_size or settings.MAIL_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+
+    sent = []
+    retried = set()
+    connection = get_connection()
+    try:
+        connection.open()
+        for notification in batch:
+            message = EmailMessage(notification.subject, notification.body,
+                                   settings.DEFAULT_FROM_EMAIL, [notification.recipient],
+                                   connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning("Result email %s to %s failed: %s", notification.id, notification.recipient, e)
+                _reschedule(notification, str(e))
+                retried.add(notification.id)
+            else:
+                sent.append(notification.id)
+    except Exception as e:
+        # Could not even connect: put every unsent row back on the schedule.
+        logger.error("Mail connection failed: %s", e)
+        for notification in batch:
+            if notification.id not in sent and notification.id not in retried:
+                _reschedule(notification, str(e))
+                retried.add(notification.id)
+    finally:
+        connection.close()
+
+    if sent:
+        ResultNotification.objects.filter(id__in=sent).update(
+            status=ResultNotification.SENT, sent_at=timezone.now(), last_error='')
+    return len(sent), len(retried)
+
+
+def _reschedule(notification, error):
+    if notification.attempts >= settings.MAIL_MAX_ATTEMPTS:
+        notification.status = ResultNotification.FAILED
+    else:
+        notification.next_attempt_at = timezone.now() + retry_delay(notification.attempts)
+    notification.last_error = error
+    notification.save(update_fields=['status', 'next_attempt_at', 'last_error'])
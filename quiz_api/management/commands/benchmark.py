@@ -0,0 +1,169 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from quiz_api import question_bank
+from quiz_api.loadtest import format_table, summarize
+from quiz_api.models import Question, Student
+
+SCENARIOS = ('stampede', 'start', 'answers', 'polling', 'compile')
+
+COMPILE_SNIPPET = "print(sum(range(1000)))\n"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the quiz API offline: seed a throwaway database, replay "
+        "contest traffic through the WSGI handler in-process and report "
+        "latency percentiles, throughput and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--questions', type=int, default=30)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--polls', type=int, default=500,
+                            help="Leaderboard requests in the polling scenario.")
+        parser.add_argument('--compiles', type=int, default=20,
+                            help="Requests in the compile scenario.")
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help="Run only this scenario; repeat for several. Default: all.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the traffic.")
+        parser.add_argument('--json', dest='json_path',
+                            help="Also write the result rows to this file, for comparing runs.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        scenarios = options['scenario'] or SCENARIOS
+        with tempfile.TemporaryDirectory(prefix='quiz-benchmark-') as tmp, ExitStack() as stack:
+            # Keep the benchmark away from shared caches of a real deployment.
+            stack.enter_context(override_settings(
+                QUESTION_BANK_CACHE_FILE=None,
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'answer_state': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                     'LOCATION': 'benchmark-answer-state'},
+                },
+            ))
+            default = connections['default']
+            if default.vendor == 'sqlite':
+                # A file, not SQLite's default in-memory test database, so
+                # concurrent clients wait on locks instead of failing.
+                default.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'benchmark.sqlite3')
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                students, questions = self.seed(options['students'], options['questions'])
+                rows = []
+                for scenario in scenarios:
+                    requests = getattr(self, f'{scenario}_requests')(students, questions, options)
+                    if requests:
+                        rows.extend(self.drive(requests, options['concurrency']))
+            finally:
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0)
+
+        self.stdout.write(format_table(rows))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(rows, f, indent=2)
+
+    def seed(self, student_count, question_count):
+        Student.objects.bulk_create(
+            Student(name=f'Student {i}', email=f'student{i}@example.com', department='CSE',
+                    college='Benchmark College', year='2nd Year')
+            for i in range(student_count)
+        )
+        Question.objects.bulk_create(
+            Question(text=f'Question {i}: ' + 'lorem ipsum ' * 20, code_snippet='print(1)\n' * 5,
+                     option_a='A', option_b='B', option_c='C', option_d='D',
+                     correct_option=self.random.choice('ABCD'), category=('python', 'sql', 'logic')[i % 3])
+            for i in range(question_count)
+        )
+        # bulk_create sends no signals.
+        question_bank.invalidate()
+        return (list(Student.objects.values_list('id', flat=True)),
+                list(Question.objects.values_list('id', 'correct_option')))
+
+    def stampede_requests(self, students, questions, options):
+        """Every student loads the question bank at quiz start."""
+        return [('get_questions', 'GET', '/api/questions/', None) for _ in students]
+
+    def start_requests(self, students, questions, options):
+        """Every student starts their quiz, drawing a question set."""
+        return [('start_quiz', 'POST', '/api/quiz/start/', {'student_id': student_id}) for student_id in students]
+
+    def answers_requests(self, students, questions, options):
+        """Each student answers every question, mostly correctly, interleaved."""
+        requests = []
+        for question_id, correct_option in questions:
+            for student_id in students:
+                chosen = correct_option if self.random.random() < 0.7 else self.random.choice('ABCD')
+                requests.append(('submit_answer', 'POST', '/api/submit-answer/',
+                                 {'student_id': student_id, 'question_id': question_id,
+                                  'chosen_option': chosen}))
+        return requests
+
+    def polling_requests(self, students, questions, options):
+        return [('leaderboard', 'GET', '/api/leaderboard/', None) for _ in range(options['polls'])]
+
+    def compile_requests(self, students, questions, options):
+        return [('compile_code', 'POST', '/api/compile/', {'code': COMPILE_SNIPPET, 'language': 'python'})
+                for _ in range(options['compiles'])]
+
+    def drive(self, requests, concurrency):
+        """Replay `requests` from `concurrency` threads; one summary row per endpoint."""
+        pending = iter(requests)
+        lock = threading.Lock()
+        results = {}  # endpoint -> [latencies, errors, queries]
+
+        def worker():
+            client = Client()
+            counter = [0]
+
+            def count_queries(execute, sql, params, many, context):
+                counter[0] += 1
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                for alias in connections:
+                    # Connect first so setup statements are not counted.
+                    connections[alias].ensure_connection()
+                    stack.enter_context(connections[alias].execute_wrapper(count_queries))
+                while True:
+                    with lock:
+                        request = next(pending, None)
+                    if request is None:
+                        break
+                    name, method, path, body = request
+                    counter[0] = 0
+                    start = time.perf_counter()
+                    if method == 'GET':
+                        response = client.get(path)
+                    else:
+                        response = client.post(path, body, content_type='application/json')
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        entry = results.setdefault(name, [[], 0, 0])
+                        entry[0].append(elapsed)
+                        entry[1] += response.status_code >= 500
+                        entry[2] += counter[0]
+            connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return [summarize(name, latencies, elapsed, errors, queries=queries / len(latencies))
+                for name, (latencies, errors, queries) in results.items()]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_api import question_io
+
+
+class Command(BaseCommand):
+    help = "Export the question bank as CSV or JSON lines, in the format import_questions reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Default: stdout.")
+        parser.add_argument('--format', choices=question_io.FORMATS,
+                            help="Default: from the file extension, or jsonl for stdout.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path == '-' else question_io.guess_format(path))
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+        if path == '-':
+            for chunk in question_io.export_questions(fmt):
+                self.stdout.write(chunk, ending='')
+            return
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in question_io.export_questions(fmt):
+                f.write(chunk)
+                count += 1
+        self.stdout.write(f"Wrote {count - (fmt == 'csv')} questions to {path}")
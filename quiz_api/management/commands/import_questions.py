@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_api import question_io
+
+
+class Command(BaseCommand):
+    help = (
+        "Import questions from a CSV or JSON-lines file ('-' for stdin), in "
+        "one transaction, skipping questions the bank already has."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=question_io.FORMATS,
+                            help="Default: from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per INSERT.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and count, but insert nothing.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or question_io.guess_format(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+        try:
+            if path == '-':
+                result = question_io.import_questions(sys.stdin, fmt, options['batch_size'], options['dry_run'])
+            else:
+                # utf-8-sig: spreadsheet exports often start with a BOM.
+                with open(path, encoding='utf-8-sig', newline='') as f:
+                    result = question_io.import_questions(f, fmt, options['batch_size'], options['dry_run'])
+        except question_io.ImportFailed as e:
+            for line, message in e.errors:
+                self.stderr.write(f"line {line}: {message}")
+            raise CommandError(str(e))
+        verb = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(f"{verb} {result['created']} questions, skipped {result['duplicates']} duplicates.")
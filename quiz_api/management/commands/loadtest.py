@@ -0,0 +1,79 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_api.loadtest import format_table, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a running server with concurrent requests and report latency. "
+        "Pass several --url values to compare deployments, e.g. gunicorn WSGI "
+        "against an ASGI server, on the same scenario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True,
+                            help="Base URL of a running server; repeat to compare several.")
+        parser.add_argument('--path', default='/api/questions/')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--data', help="JSON body for POST requests.")
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        body = options['data']
+        if body is not None:
+            try:
+                json.loads(body)
+            except ValueError as e:
+                raise CommandError(f"--data is not valid JSON: {e}")
+        rows = [self.run(url, options['path'], options['method'].upper(), body,
+                         options['concurrency'], options['requests'])
+                for url in options['url']]
+        self.stdout.write(format_table(rows))
+
+    def run(self, base_url, path, method, body, concurrency, total):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        latencies = []
+        errors = [0]
+        remaining = [total]
+        lock = threading.Lock()
+
+        def worker():
+            # One keep-alive connection per simulated client.
+            connection = connection_class(parts.netloc, timeout=60)
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+                start = time.perf_counter()
+                try:
+                    connection.request(method, parts.path.rstrip('/') + path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status < 500
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if not ok:
+                        errors[0] += 1
+            connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(f'{base_url}{path}', latencies, time.perf_counter() - started, errors[0])
@@ -0,0 +1,82 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from quiz_api import mailer
+from quiz_api.models import CodeJob
+from quiz_api.sandbox import SandboxBusy, run_submission
+
+logger = logging.getLogger(__name__)
+
+# A job still `running` this long after it was claimed belongs to a worker
+# that died; it goes back in the queue. Runs are capped far below this.
+LEASE_SECONDS = 300
+
+
+class Command(BaseCommand):
+    help = "Run queued code jobs and send queued result emails (the Procfile `worker` process)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once the queue is empty instead of polling forever.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Processing code jobs and result emails...")
+        while True:
+            job = self.claim_next()
+            if job is not None:
+                self.run(job)
+                continue
+            sent, retried = mailer.dispatch_pending()
+            if sent or retried:
+                self.stdout.write(f"Result emails: {sent} sent, {retried} to retry")
+                continue
+            if options['burst']:
+                return
+            time.sleep(options['sleep'])
+
+    def claim_next(self):
+        """
+        Mark the oldest queued job as running and return it.
+
+        The conditional UPDATE makes the claim safe with several workers: if
+        another worker got there first it matches no rows and we try again.
+        Jobs whose lease ran out are requeued first.
+        """
+        CodeJob.objects.filter(
+            status=CodeJob.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=LEASE_SECONDS),
+        ).update(status=CodeJob.QUEUED, started_at=None)
+        while True:
+            job_id = (CodeJob.objects.filter(status=CodeJob.QUEUED)
+                      .order_by('created_at')
+                      .values_list('id', flat=True)
+                      .first())
+            if job_id is None:
+                return None
+            claimed = CodeJob.objects.filter(id=job_id, status=CodeJob.QUEUED).update(
+                status=CodeJob.RUNNING, started_at=timezone.now())
+            if claimed:
+                return CodeJob.objects.get(id=job_id)
+
+    def run(self, job):
+        # Writes only land while the job is still this worker's claim; once
+        # the lease ran out another worker may have taken it over.
+        claim = CodeJob.objects.filter(id=job.id, status=CodeJob.RUNNING, started_at=job.started_at)
+        try:
+            output, _ = run_submission(job.code, job.language)
+            status = CodeJob.DONE
+        except SandboxBusy:
+            # Put it back for the next poll rather than failing the student's run.
+            claim.update(status=CodeJob.QUEUED, started_at=None)
+            return
+        except Exception as e:
+            logger.exception("Code job %s failed", job.id)
+            output = f'Execution error: {str(e)}'
+            status = CodeJob.FAILED
+        if not claim.update(output=output, status=status, finished_at=timezone.now()):
+            logger.warning("Code job %s was reclaimed before it finished; dropping this result", job.id)
@@ -0,0 +1,176 @@
+"""
+In-process request metrics, exposed at /metrics in Prometheus text format.
+
+middleware.request_metrics counts every request and records its latency per
+route. A METRICS_SAMPLE_RATE fraction of requests is also broken down:
+database queries and their time (recorded by a wrapper installed on every
+connection, see signals.py) and named spans such as serialization or
+sandbox runs. Sampled responses carry the breakdown in a Server-Timing
+header.
+
+Histograms use fixed log-scale buckets (1-2-5 per decade), so their
+relative precision is the same for a 2 ms and a 2 s request. Metrics are
+kept per worker process; Prometheus sees whichever worker answers a scrape.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+# name: (type, help, buckets)
+METRICS = {
+    'quiz_http_requests_total': ('counter', 'HTTP requests by route, method and status.', None),
+    'quiz_http_request_duration_seconds': ('histogram', 'Time until the response was returned.', SECONDS_BUCKETS),
+    'quiz_db_queries': ('histogram', 'Database queries per sampled request.', COUNT_BUCKETS),
+    'quiz_db_seconds': ('histogram', 'Time in database queries per sampled request.', SECONDS_BUCKETS),
+    'quiz_span_seconds': ('histogram', 'Time in named spans (serialize, sandbox, compile) per sampled request.',
+                          SECONDS_BUCKETS),
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}  # (name, labels) -> count or Histogram
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def render(self):
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: item[0])
+            snapshot = [(key, value if isinstance(value, int) else
+                         (list(value.counts), value.sum, value.count, value.buckets))
+                        for key, value in series]
+        lines = []
+        current = None
+        for (name, labels), value in snapshot:
+            if name != current:
+                current = name
+                kind, help_text, _ = METRICS[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+            if isinstance(value, int):
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            counts, total, count, buckets = value
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """Breakdown of one sampled request."""
+    __slots__ = ('queries', 'db_seconds', 'spans')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.spans = {}
+
+
+_current = contextvars.ContextVar('quiz_request_stats', default=None)
+
+
+def begin(sampled):
+    """Start tracking the current request; returns a token for end()."""
+    return _current.set(RequestStats() if sampled else None)
+
+
+def end(token):
+    stats = _current.get()
+    _current.reset(token)
+    return stats
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper: time queries of sampled requests."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's `name` span."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.spans[name] = stats.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def record(route, method, status, duration, stats):
+    registry.inc('quiz_http_requests_total', {'route': route, 'method': method, 'status': str(status)})
+    registry.observe('quiz_http_request_duration_seconds', {'route': route}, duration)
+    if stats is None:
+        return
+    registry.observe('quiz_db_queries', {'route': route}, stats.queries)
+    registry.observe('quiz_db_seconds', {'route': route}, stats.db_seconds)
+    for name, seconds in stats.spans.items():
+        registry.observe('quiz_span_seconds', {'route': route, 'span': name}, seconds)
+
+
+def server_timing(duration, stats):
+    entries = [f'total;dur={duration * 1000:.1f}',
+               f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"']
+    entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in stats.spans.items()]
+    return ', '.join(entries)
@@ -0,0 +1,93 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics, routers
+
+PIN_COOKIE = 'db_primary_pin'
+
+
+@sync_and_async_middleware
+def replica_pinning(get_response):
+    """
+    Read-your-writes for the primary/replica router.
+
+    Requests that may write, and requests from clients that wrote within
+    REPLICA_PIN_SECONDS (tracked with a short-lived cookie), read from the
+    primary. Everything else may be served by the replica.
+    """
+    def start(request):
+        writes = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        if writes or PIN_COOKIE in request.COOKIES:
+            routers.pin_primary()
+        return writes
+
+    def finish(request, response, writes):
+        if writes or (routers.is_pinned() and PIN_COOKIE not in request.COOKIES):
+            # Cross-site cookies (the frontend is on another origin) must be
+            # SameSite=None, which browsers only accept over HTTPS.
+            secure = request.is_secure()
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, secure=secure,
+                                samesite='None' if secure else 'Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = routers._pinned.set(False)
+            try:
+                writes = start(request)
+                return finish(request, await get_response(request), writes)
+            finally:
+                routers._pinned.reset(token)
+    else:
+        def middleware(request):
+            token = routers._pinned.set(False)
+            try:
+                writes = start(request)
+                return finish(request, get_response(request), writes)
+            finally:
+                routers._pinned.reset(token)
+    return middleware
+
+
+@sync_and_async_middleware
+def request_metrics(get_response):
+    """
+    Count and time every request per route; break down a METRICS_SAMPLE_RATE
+    fraction of them (see metrics.py) and report that in Server-Timing.
+    """
+    def finish(request, response, start, token):
+        duration = time.perf_counter() - start
+        stats = metrics.end(token)
+        match = request.resolver_match
+        metrics.record(match.route if match else 'unmatched', request.method,
+                       response.status_code, duration, stats)
+        if stats is not None:
+            response['Server-Timing'] = metrics.server_timing(duration, stats)
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = metrics.begin(random.random() < settings.METRICS_SAMPLE_RATE)
+            start = time.perf_counter()
+            try:
+                response = await get_response(request)
+            except BaseException:
+                metrics.end(token)
+                raise
+            return finish(request, response, start, token)
+    else:
+        def middleware(request):
+            token = metrics.begin(random.random() < settings.METRICS_SAMPLE_RATE)
+            start = time.perf_counter()
+            try:
+                response = get_response(request)
+            except BaseException:
+                metrics.end(token)
+                raise
+            return finish(request, response, start, token)
+    return middleware
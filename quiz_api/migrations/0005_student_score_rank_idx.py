@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0004_codejob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['-total_score', 'id'], name='student_score_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:53
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    """Keep only the latest answer for each (student, question) pair."""
+    StudentAnswer = apps.get_model('quiz_api', 'StudentAnswer')
+    answers = StudentAnswer.objects.using(schema_editor.connection.alias)
+    duplicates = (answers.values('student_id', 'question_id')
+                  .annotate(latest=Max('id'), count=Count('id'))
+                  .filter(count__gt=1))
+    for pair in duplicates.iterator():
+        (answers.filter(student_id=pair['student_id'], question_id=pair['question_id'])
+         .exclude(id=pair['latest']).delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0006_resultnotification'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='studentanswer',
+            constraint=models.UniqueConstraint(fields=('student', 'question'), name='unique_student_answer'),
+        ),
+        migrations.AlterField(
+            model_name='studentanswer',
+            name='student',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='quiz_api.student'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:03
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+CONTENT_FIELDS = ('text', 'code_snippet', 'option_a', 'option_b', 'option_c', 'option_d')
+
+
+def hash_existing_questions(apps, schema_editor):
+    """Same hash as Question.hash_content, frozen here."""
+    Question = apps.get_model('quiz_api', 'Question')
+    questions = Question.objects.using(schema_editor.connection.alias)
+    for question in questions.only('id', *CONTENT_FIELDS).iterator():
+        content = [(getattr(question, field) or '').replace('\r\n', '\n').strip() for field in CONTENT_FIELDS]
+        digest = hashlib.sha256(json.dumps(content).encode()).hexdigest()
+        questions.filter(id=question.id).update(content_hash=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0007_studentanswer_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(hash_existing_questions, migrations.RunPython.noop),
+    ]
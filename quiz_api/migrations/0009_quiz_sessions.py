@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0008_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizSession',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='quiz_api.student')),
+                ('seed', models.BigIntegerField()),
+                ('question_ids', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -1,4 +1,10 @@
+import hashlib
+import json
+import uuid
+
 from django.db import models
+from django.utils import timezone
+from django.utils.text import Truncator
 
 
 class Student(models.Model):
@@ -10,6 +16,12 @@ class Student(models.Model):
 
     total_score = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Serves leaderboard pages and rank lookups without a full sort.
+            models.Index(fields=['-total_score', 'id'], name='student_score_rank_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.email})"
 
@@ -22,21 +34,66 @@ class Question(models.Model):
     option_c = models.CharField(max_length=255)
     option_d = models.CharField(max_length=255)
     correct_option = models.CharField(max_length=1)  # 'A', 'B', 'C', or 'D'
+    # Groups questions for QUIZ_CATEGORY_QUOTAS (see quiz_sets.py).
+    category = models.CharField(max_length=50, blank=True, default='')
+    # Identifies a question by its content, so imports can skip ones the
+    # bank already has (see question_io.py).
+    content_hash = models.CharField(max_length=64, db_index=True, editable=False, default='')
+
+    CONTENT_FIELDS = ('text', 'code_snippet', 'option_a', 'option_b', 'option_c', 'option_d')
 
     def __str__(self):
-        return self.text
+        # Shown in admin titles, messages and relation widgets; the text can be long.
+        return Truncator(self.text).chars(80)
+
+    @classmethod
+    def hash_content(cls, values):
+        """Hash of a question's text, code and options; `values` maps field names to them."""
+        content = [(values.get(field) or '').replace('\r\n', '\n').strip() for field in cls.CONTENT_FIELDS]
+        return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.hash_content(self.__dict__)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content_hash' not in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
 
 
 class StudentAnswer(models.Model):
-    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    # No index of its own: unique_student_answer leads with student.
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, db_index=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     chosen_option = models.CharField(max_length=1)
     is_correct = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # One answer per student and question; also the index for
+            # answer lookups and a student's answer history.
+            models.UniqueConstraint(fields=['student', 'question'], name='unique_student_answer'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.question}"
 
 
+class QuizSession(models.Model):
+    """The questions drawn for one student's quiz (see quiz_sets.py)."""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True)
+    seed = models.BigIntegerField()
+    # Comma-separated, in the order they are served.
+    question_ids = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Quiz for {self.student}"
+
+    @staticmethod
+    def parse_ids(question_ids):
+        return tuple(int(question_id) for question_id in question_ids.split(',') if question_id)
+
+
 class Leaderboard(Student):
     """
     A proxy model that references the same data as Student
@@ -47,3 +104,73 @@ class Leaderboard(Student):
         verbose_name = "Leaderboard"
         verbose_name_plural = "Leaderboard"
         ordering = ["-total_score"]  # <--- Sort by total_score descending
+
+
+class CodeJob(models.Model):
+    """
+    A code submission queued for the `process_tasks` worker, so running it
+    does not hold a web worker.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    FINISHED = (DONE, FAILED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    language = models.CharField(max_length=20, default='python')
+    code = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    output = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The worker claims the oldest queued job first.
+            models.Index(fields=['status', 'created_at'], name='codejob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.language} job {self.id} ({self.status})"
+
+
+class ResultNotification(models.Model):
+    """
+    Outbox row for a quiz-results email. complete_quiz writes it in the same
+    transaction as the score; the mailer sends it later (see mailer.py).
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient} ({self.status})"
@@ -0,0 +1,189 @@
+"""
+Pre-rendered JSON for GET /api/questions/.
+
+The bank only changes when an admin edits a Question, so the serialized
+payload is built once and reused until a post_save/post_delete signal on
+Question invalidates it (see signals.py). Bulk queryset updates bypass those
+signals; call invalidate() after them.
+
+With QUESTION_BANK_CACHE_FILE set, the payload is also written to that file so
+every worker process can share it: each process remembers the file's mtime
+and reloads when another process has rebuilt or removed it. Without it a
+process cannot see invalidations made by other processes, so its copy is
+rebuilt once it is QUESTION_BANK_TTL seconds old.
+
+The answer key is not part of the payload. answer_key() keeps it as a
+separate {question_id: correct_option} index for grading, loaded with one
+narrow query and invalidated together with the payload. pool() and
+fragments() are kept the same way for per-student question sets (see
+quiz_sets.py): the question ids by category, and each question's JSON.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+from .models import Question
+from .serializers import QuestionSerializer
+
+_lock = threading.Lock()
+_cached = None  # (payload, etag, file mtime or None, loaded at)
+_indexes = {}  # name -> (index, file mtime or None, loaded at)
+
+
+def _cache_file():
+    return getattr(settings, 'QUESTION_BANK_CACHE_FILE', None)
+
+
+def _etag(payload):
+    return '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+
+
+def _questions():
+    # Always the primary: a copy built from a lagging replica right after an
+    # invalidation would be kept until the next one (see routers.py).
+    return Question.objects.using(DEFAULT_DB_ALIAS)
+
+
+def _render():
+    questions = _questions().order_by('id')
+    with metrics.span('serialize'):
+        return JSONRenderer().render(QuestionSerializer(questions, many=True).data)
+
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _write_file(path, payload):
+    # Write-then-rename so readers never see a half-written bank.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.questions-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _current(entry, path, mtime):
+    """Whether a cached entry is still valid: same file mtime, or younger than the TTL without a file."""
+    if path:
+        return mtime is not None and entry[-2] == mtime
+    return time.monotonic() - entry[-1] < settings.QUESTION_BANK_TTL
+
+
+def _fresh(path):
+    """Return (cached entry or None, current file mtime)."""
+    mtime = _file_mtime(path) if path else None
+    cached = _cached
+    if cached is not None and _current(cached, path, mtime):
+        return cached, mtime
+    return None, mtime
+
+
+def get_payload():
+    """Return (json_bytes, etag) for the current question bank."""
+    global _cached
+    path = _cache_file()
+    cached, mtime = _fresh(path)
+    if cached is not None:
+        return cached[0], cached[1]
+
+    with _lock:
+        # Another thread may have loaded it while this one waited.
+        cached, mtime = _fresh(path)
+        if cached is not None:
+            return cached[0], cached[1]
+        if path and mtime is not None:
+            with open(path, 'rb') as f:
+                payload = f.read()
+        else:
+            payload = _render()
+            if path:
+                _write_file(path, payload)
+                mtime = _file_mtime(path)
+        _cached = (payload, _etag(payload), mtime, time.monotonic())
+        return _cached[0], _cached[1]
+
+
+async def aget_payload():
+    """Async get_payload(): cache hits never leave the event loop."""
+    cached, _ = _fresh(_cache_file())
+    if cached is not None:
+        return cached[0], cached[1]
+    return await sync_to_async(get_payload)()
+
+
+def _index(name, build, refresh):
+    """
+    Return the `name` index, from memory unless `refresh` is set or it is stale.
+
+    With QUESTION_BANK_CACHE_FILE set, indexes are tied to the file's mtime,
+    so an edit made through another worker is picked up here too; without
+    it they expire after QUESTION_BANK_TTL seconds.
+    """
+    path = _cache_file()
+    mtime = _file_mtime(path) if path else None
+    if path and mtime is None:
+        # Re-render the file after an invalidation, so there is an mtime to
+        # tie the index to.
+        get_payload()
+        mtime = _file_mtime(path)
+    cached = _indexes.get(name)
+    if not refresh and cached is not None and _current(cached, path, mtime):
+        return cached[0]
+    index = build()
+    _indexes[name] = (index, mtime, time.monotonic())
+    return index
+
+
+def answer_key(refresh=False):
+    """Return {question_id: correct_option} for every question."""
+    return _index('answer_key', lambda: dict(_questions().values_list('id', 'correct_option')), refresh)
+
+
+def _build_pool():
+    pool = {}
+    for question_id, category in _questions().order_by('category', 'id').values_list('id', 'category'):
+        pool.setdefault(category, []).append(question_id)
+    return {category: tuple(ids) for category, ids in pool.items()}
+
+
+def pool(refresh=False):
+    """Return {category: (question ids, ascending)}; uncategorized questions are under ''."""
+    return _index('pool', _build_pool, refresh)
+
+
+def _build_fragments():
+    questions = _questions().order_by('id')
+    renderer = JSONRenderer()
+    with metrics.span('serialize'):
+        return {question['id']: renderer.render(question)
+                for question in QuestionSerializer(questions, many=True).data}
+
+
+def fragments(refresh=False):
+    """Return {question_id: the question as in the payload, rendered to JSON bytes}."""
+    return _index('fragments', _build_fragments, refresh)
+
+
+def invalidate():
+    """Drop the cached payload here and, if configured, for every other worker."""
+    global _cached
+    with _lock:
+        _cached = None
+        _indexes.clear()
+        path = _cache_file()
+        if path:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,143 @@
+"""
+Bulk import and export of the question bank as CSV or JSON lines.
+
+Both directions stream. An import validates every row and inserts them with
+batched bulk_create inside one transaction, so a bad row anywhere leaves the
+bank untouched; rows whose content hash the bank (or an earlier row of the
+same file) already has are skipped. An export reads with iterator() and
+writes the same columns, so its output can be imported again.
+
+Used by the import_questions/export_questions commands and QuestionAdmin.
+"""
+import csv
+import json
+
+from django.db import transaction
+
+from . import question_bank
+from .models import Question
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = Question.CONTENT_FIELDS + ('correct_option', 'category')
+OPTIONAL = ('code_snippet', 'category')
+OPTIONS = ('option_a', 'option_b', 'option_c', 'option_d')
+MAX_ERRORS = 20
+
+
+class ImportFailed(Exception):
+    def __init__(self, errors):
+        self.errors = errors  # [(line, message)]
+        super().__init__(f"{len(errors)} invalid row(s), nothing was imported")
+
+
+def guess_format(filename):
+    """'csv' or 'jsonl' from a file name, or None."""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(extension)
+
+
+def _rows(lines, fmt):
+    """Yield (line number, row) pairs; a row is a dict, or a string describing why it is not one."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        missing = [field for field in FIELDS if field not in OPTIONAL and field not in (reader.fieldnames or ())]
+        if missing:
+            yield 1, f"Missing columns: {', '.join(missing)}"
+            return
+        for row in reader:
+            # line_num is where the row ends; code snippets span lines.
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _clean(row):
+    """The model field values for `row`; raises ValueError if it is not a valid question."""
+    values = {field: '' if row.get(field) is None else str(row[field]) for field in FIELDS}
+    if not values['text'].strip():
+        raise ValueError("text is required")
+    for field in OPTIONS:
+        if not values[field].strip():
+            raise ValueError(f"{field} is required")
+        if len(values[field]) > Question._meta.get_field(field).max_length:
+            raise ValueError(f"{field} is longer than {Question._meta.get_field(field).max_length} characters")
+    values['correct_option'] = values['correct_option'].strip().upper()
+    if values['correct_option'] not in ('A', 'B', 'C', 'D'):
+        raise ValueError("correct_option must be one of A, B, C, D")
+    values['code_snippet'] = values['code_snippet'] or None
+    values['category'] = values['category'].strip()
+    if len(values['category']) > Question._meta.get_field('category').max_length:
+        raise ValueError(f"category is longer than {Question._meta.get_field('category').max_length} characters")
+    return values
+
+
+def import_questions(lines, fmt, batch_size=500, dry_run=False):
+    """
+    Import questions from `lines` (any iterable of text lines, e.g. an open
+    file) and return {'created': n, 'duplicates': n}. Raises ImportFailed,
+    listing up to MAX_ERRORS invalid rows, if any row is invalid.
+    """
+    created = duplicates = 0
+    errors = []
+    batch = []
+    with transaction.atomic():
+        seen = set(Question.objects.values_list('content_hash', flat=True))
+        for line, row in _rows(lines, fmt):
+            try:
+                if isinstance(row, str):
+                    raise ValueError(row)
+                values = _clean(row)
+            except ValueError as e:
+                errors.append((line, str(e)))
+                if len(errors) >= MAX_ERRORS:
+                    break
+                continue
+            content_hash = Question.hash_content(values)
+            if content_hash in seen:
+                duplicates += 1
+                continue
+            seen.add(content_hash)
+            created += 1
+            if errors or dry_run:
+                continue
+            batch.append(Question(content_hash=content_hash, **values))
+            if len(batch) >= batch_size:
+                Question.objects.bulk_create(batch)
+                batch = []
+        if errors:
+            raise ImportFailed(errors)
+        if batch:
+            Question.objects.bulk_create(batch)
+        if created and not dry_run:
+            # bulk_create sends no post_save for signals.question_changed.
+            transaction.on_commit(question_bank.invalidate)
+    return {'created': created, 'duplicates': duplicates}
+
+
+class _Echo:
+    """A file-like object whose write() returns what it was given, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_questions(fmt, queryset=None):
+    """Yield `queryset` (default: every question), as lines of CSV or JSON."""
+    queryset = Question.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('id').values_list(*FIELDS).iterator(chunk_size=2000)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for values in rows:
+            yield writer.writerow(values)
+        return
+    for values in rows:
+        yield json.dumps(dict(zip(FIELDS, values))) + '\n'
@@ -0,0 +1,78 @@
+"""
+Per-student question sets for POST /api/quiz/start/.
+
+Each student gets a random subset of the bank, drawn once from a seeded
+random.Random and stored on a QuizSession, so reloading the quiz serves the
+same questions in the same order. Draws sample question_bank.pool(), an
+in-memory index of ids by category, instead of asking the database for
+ORDER BY RANDOM(); the response is joined from pre-rendered per-question
+JSON (question_bank.fragments()). Starting a quiz therefore costs a couple
+of primary-key queries however large the bank is.
+
+The drawn ids are cached with the student's answer state, and
+scoring.submit_answer(s) rejects questions outside the set. Students
+without a session (clients still on /api/questions/) may answer any question.
+"""
+import random
+import secrets
+
+from django.conf import settings
+from django.db import transaction
+
+from . import answer_state, question_bank
+from .models import QuizSession, Student
+
+
+def draw(pool, seed, count=0, quotas=None):
+    """
+    Pick question ids from `pool` ({category: ids}, see question_bank.pool()).
+
+    Takes up to quotas[category] ids from each category, then tops the set
+    up to `count` from all questions; a count of 0 means the whole pool. The
+    same pool and seed always give the same ids, in the same shuffled order.
+    """
+    rng = random.Random(seed)
+    quotas = quotas or {}
+    chosen = []
+    for category in sorted(quotas):
+        ids = pool.get(category, ())
+        chosen.extend(rng.sample(ids, min(quotas[category], len(ids))))
+    all_ids = [question_id for category in sorted(pool) for question_id in pool[category]]
+    if not count:
+        count = len(all_ids)
+    missing = count - len(chosen)
+    if missing > 0:
+        # Oversample by the ids already taken instead of filtering them out
+        # of the whole pool first.
+        taken = set(chosen)
+        extra = rng.sample(all_ids, min(missing + len(taken), len(all_ids)))
+        chosen.extend([question_id for question_id in extra if question_id not in taken][:missing])
+    rng.shuffle(chosen)
+    return chosen
+
+
+def start(student_id):
+    """
+    Return the question ids of the student's quiz, drawing them on the first call.
+
+    Raises Student.DoesNotExist for an unknown student.
+    """
+    if not Student.objects.filter(id=student_id).exists():
+        raise Student.DoesNotExist(f"Student {student_id} not found")
+    # Drawing is cheap and in memory, so a resumed quiz only wastes a draw.
+    seed = secrets.randbits(63)
+    question_ids = draw(question_bank.pool(), seed, settings.QUIZ_QUESTION_COUNT, settings.QUIZ_CATEGORY_QUOTAS)
+    session, _ = QuizSession.objects.get_or_create(
+        student_id=student_id,
+        defaults={'seed': seed, 'question_ids': ','.join(map(str, question_ids))},
+    )
+    question_ids = QuizSession.parse_ids(session.question_ids)
+    transaction.on_commit(lambda: answer_state.store_question_set(student_id, question_ids))
+    return question_ids
+
+
+def render(question_ids):
+    """The questions as a JSON list, like /api/questions/; deleted questions are left out."""
+    fragments = question_bank.fragments()
+    return b'[' + b','.join(fragments[question_id] for question_id in question_ids
+                            if question_id in fragments) + b']'
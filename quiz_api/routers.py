@@ -0,0 +1,49 @@
+"""
+Primary/replica routing for deployments with DATABASE_REPLICA_URL set.
+
+Reads go to the replica and writes to the primary ('default'). Reads are
+kept on the primary whenever the replica could be behind what the caller
+expects to see:
+
+- inside a transaction on the primary (select_for_update, scoring), and
+- once the current request or command has written, or the client wrote
+  within the last REPLICA_PIN_SECONDS (see middleware.replica_pinning),
+  so a student sees their own submission on the next leaderboard fetch.
+
+question_bank.py also reads from the primary explicitly, because its
+cached copies outlive the request that builds them.
+"""
+import contextvars
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+_pinned = contextvars.ContextVar('quiz_primary_pinned', default=False)
+
+
+def pin_primary():
+    """Send every following read in this context to the primary."""
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,877 @@
+"""
+Code execution sandbox behind /api/compile/.
+
+Every language gets a RunnerPool: a bounded number of execution slots with a
+bounded wait queue in front of them (admission control), plus - for Python
+and Java - a few pre-started runner processes that sit blocked on stdin until
+a submission is handed to them. A warm runner reads the path of the program
+to run from its first stdin line, runs it, and exits; the pool starts a
+replacement in the background so the next request does not pay interpreter
+or JVM startup.
+
+Runners are started in their own session with resource limits applied via
+prlimit (CPU time, address space, process count, file size) and, when
+SANDBOX_CGROUP names a delegated cgroup v2 directory, are moved into it so
+the cgroup's memory.max/pids.max cap all submissions together. Output is read
+incrementally and the runner is killed once it exceeds
+SANDBOX_MAX_OUTPUT_BYTES. Each run reports its CPU time, peak RSS and output
+size (RunResult.usage()).
+
+Batch mode (run_batch) compiles a submission once and runs it against a list
+of test cases, each case in its own warm runner, so grading costs one compile
+plus N runs without interpreter or JVM startup. Verdicts are worked out here
+from what this process read off each runner's pipes and its exit status,
+never from anything the submission could write or reach.
+
+C and Java builds go through a CompileCache: artifacts are stored on local
+disk under a hash of the language, compiler, flags and source, so re-running
+unchanged code (or the same starter template) skips gcc/javac entirely.
+"""
+import atexit
+import codecs
+import hashlib
+import logging
+import math
+import os
+import queue
+import resource
+import select
+import selectors
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxBusy(Exception):
+    """Raised when a pool has no free slot and its wait queue is full."""
+
+
+PYTHON_BOOTSTRAP = r"""
+import os, runpy, sys
+
+
+def read_header():
+    # Byte by byte from fd 0, so nothing after the header is buffered away
+    # from the program (or from a binary we exec).
+    header = b''
+    while True:
+        c = os.read(0, 1)
+        if not c or c == b'\n':
+            return header.decode('utf-8')
+        header += c
+
+
+header = read_header()
+if header.startswith('EXEC\t'):
+    binary = header[len('EXEC\t'):]
+    os.execv(binary, [binary])
+elif header:
+    sys.argv = [header]
+    sys.path[0] = os.path.dirname(header)
+    runpy.run_path(header, run_name='__main__')
+"""
+
+JAVA_BOOTSTRAP = r"""
+import java.io.File;
+import java.io.IOException;
+import java.io.InputStream;
+import java.lang.reflect.InvocationTargetException;
+import java.net.URL;
+import java.net.URLClassLoader;
+
+public class SandboxRunner {
+    public static void main(String[] args) throws Exception {
+        InputStream stdin = System.in;
+        String header = readLine(stdin);
+        if (header == null || header.isEmpty()) {
+            return;
+        }
+        try (URLClassLoader loader = loaderFor(header.trim())) {
+            invokeMain(loader);
+        } catch (InvocationTargetException e) {
+            e.getCause().printStackTrace();
+            System.exit(1);
+        }
+    }
+
+    // Read byte by byte so whatever follows the line is left on stdin for Main.
+    static String readLine(InputStream in) throws IOException {
+        StringBuilder line = new StringBuilder();
+        int c;
+        while ((c = in.read()) != -1 && c != '\n') {
+            line.append((char) c);
+        }
+        return c == -1 && line.length() == 0 ? null : line.toString();
+    }
+
+    static URLClassLoader loaderFor(String dir) throws IOException {
+        URL[] urls = {new File(dir).toURI().toURL()};
+        return new URLClassLoader(urls, SandboxRunner.class.getClassLoader());
+    }
+
+    static void invokeMain(ClassLoader loader) throws Exception {
+        Class<?> main = Class.forName("Main", true, loader);
+        main.getMethod("main", String[].class).invoke(null, (Object) new String[0]);
+    }
+}
+"""
+
+# Seconds added to a Java test case's time limit in batch mode (see run_batch).
+JAVA_STARTUP_ALLOWANCE = 1.0
+
+TOOLCHAIN_PROBES = {
+    'gcc': ['gcc', '--version'],
+    'javac': ['javac', '-version'],
+}
+
+
+COMPILER_FLAGS = {
+    'c': [],
+    'java': [],
+}
+
+
+@lru_cache(maxsize=None)
+def toolchain_version(tool):
+    """Probe a compiler once per process; returns its version line or None."""
+    try:
+        probe = subprocess.run(TOOLCHAIN_PROBES[tool], capture_output=True, check=True,
+                               text=True, timeout=10)
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return None
+    return (probe.stdout or probe.stderr).strip().splitlines()[0]
+
+
+def toolchain_available(tool):
+    return toolchain_version(tool) is not None
+
+
+@dataclass
+class RunResult:
+    stdout: str
+    stderr: str
+    returncode: int
+    cpu_time: float = 0.0
+    peak_rss_kb: int = 0
+    output_bytes: int = 0
+    truncated: bool = False
+
+    def usage(self):
+        return {
+            'cpu_time_ms': round(self.cpu_time * 1000, 3),
+            'peak_rss_kb': self.peak_rss_kb,
+            'output_bytes': self.output_bytes,
+            'output_truncated': self.truncated,
+        }
+
+
+def runner_limits(language):
+    """rlimits for a runner process; (soft, hard) pairs keyed by RLIMIT_* constant."""
+    limits = {
+        resource.RLIMIT_CORE: (0, 0),
+        resource.RLIMIT_FSIZE: (settings.SANDBOX_MAX_FILE_BYTES,) * 2,
+    }
+    if language == 'java':
+        # The JVM reserves far more address space than it uses and counts
+        # every thread against RLIMIT_NPROC, so it gets larger budgets; its
+        # heap is capped with -Xmx (see _java_runner_command).
+        limits[resource.RLIMIT_AS] = (settings.SANDBOX_JAVA_MEMORY_BYTES,) * 2
+        limits[resource.RLIMIT_NPROC] = (settings.SANDBOX_JAVA_MAX_PROCESSES,) * 2
+    else:
+        limits[resource.RLIMIT_AS] = (settings.SANDBOX_MEMORY_BYTES,) * 2
+        limits[resource.RLIMIT_NPROC] = (settings.SANDBOX_MAX_PROCESSES,) * 2
+    return limits
+
+
+class RunnerPool:
+    """
+    Admission control and warm runner processes for one language.
+
+    `command` is the argv of a warm runner and `limits` the rlimits applied
+    to each runner as it starts.
+    """
+
+    def __init__(self, name, command, size=2, max_concurrency=4,
+                 max_queue=16, queue_timeout=5.0, limits=None, max_output=64 * 1024):
+        self.name = name
+        self.command = command
+        self.size = size
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.limits = limits or {}
+        self.max_output = max_output
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._spares = queue.Queue()
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._refilling = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def slot(self):
+        """Hold one execution slot, or raise SandboxBusy if none frees up in time."""
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise SandboxBusy(f'{self.name} sandbox queue is full')
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise SandboxBusy(f'No {self.name} sandbox became free within {self.queue_timeout}s')
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _spawn(self):
+        # A new session makes the runner a process-group leader, so a kill
+        # also takes out anything the program forked.
+        proc = subprocess.Popen(self.command,
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                start_new_session=True)
+        # The runner is still blocked on its header line, so the limits are
+        # in place before any submitted code runs.
+        for limit, value in self.limits.items():
+            resource.prlimit(proc.pid, limit, value)
+        _join_cgroup(proc.pid)
+        return proc
+
+    def warm(self):
+        """Top the spare runners back up to `size`."""
+        if not self._refilling.acquire(blocking=False):
+            return
+        try:
+            while not self._closed and self._spares.qsize() < self.size:
+                self._spares.put(self._spawn())
+        except OSError:
+            logger.exception("Could not start a warm %s runner", self.name)
+        finally:
+            self._refilling.release()
+
+    def _checkout(self):
+        proc = None
+        while proc is None:
+            try:
+                proc = self._spares.get_nowait()
+            except queue.Empty:
+                proc = self._spawn()
+            if proc.poll() is not None:
+                proc = None
+        threading.Thread(target=self.warm, daemon=True).start()
+        return proc
+
+    def execute(self, header, stdin='', timeout=10, cpu_seconds=None, max_output=None):
+        """
+        Hand `header` (a program path, or an EXEC line) and `stdin` to a
+        warm runner and return a RunResult. Call this inside `slot()`.
+
+        Raises subprocess.TimeoutExpired if the run exceeds `timeout` seconds
+        of wall-clock time.
+        """
+        proc = self._checkout()
+        # CPU time is counted from runner start-up, so allow a second of slack.
+        cpu = math.ceil(cpu_seconds or min(timeout, settings.SANDBOX_CPU_SECONDS)) + 1
+        resource.prlimit(proc.pid, resource.RLIMIT_CPU, (cpu, cpu + 1))
+        with metrics.span('sandbox'):
+            return _collect(proc, f'{header}\n{stdin}'.encode('utf-8'), timeout, max_output or self.max_output)
+
+    def stream(self, header, stdin='', timeout=10):
+        """Like execute(), but yields output chunks as they arrive (see _pump)."""
+        proc = self._checkout()
+        cpu = math.ceil(min(timeout, settings.SANDBOX_CPU_SECONDS)) + 1
+        resource.prlimit(proc.pid, resource.RLIMIT_CPU, (cpu, cpu + 1))
+        return _pump(proc, f'{header}\n{stdin}'.encode('utf-8'), timeout, self.max_output)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                proc = self._spares.get_nowait()
+            except queue.Empty:
+                break
+            proc.kill()
+            proc.wait()
+
+
+class CompileCache:
+    """
+    Size-bounded, content-addressed store of compiled C binaries and Java
+    class directories.
+
+    Each entry is a directory named after its key. Hits bump the directory
+    mtime, and once the cache grows past `max_bytes` the least recently used
+    entries are removed.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(language, source, flags, compiler=''):
+        digest = hashlib.sha256()
+        for part in (language, compiler, ' '.join(flags)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(source.encode('utf-8'))
+        return digest.hexdigest()
+
+    def lookup(self, key):
+        path = os.path.join(self.root, key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, key, build_dir):
+        """Move a finished build into the cache and return its final path."""
+        path = os.path.join(self.root, key)
+        try:
+            os.rename(build_dir, path)
+        except OSError:
+            # Another worker stored the same program first.
+            shutil.rmtree(build_dir, ignore_errors=True)
+        self._evict()
+        return path
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            entries.append((entry.stat().st_mtime, size, entry.path))
+            total += size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def compile(self, language, source_path):
+        """
+        Return (artifact_dir, None) for a successful build, or
+        (None, compiler stderr) when the source does not compile.
+        """
+        with open(source_path, encoding='utf-8') as f:
+            source = f.read()
+        flags = COMPILER_FLAGS[language]
+        compiler = 'gcc' if language == 'c' else 'javac'
+        key = self.key(language, source, flags, toolchain_version(compiler) or '')
+
+        path = self.lookup(key)
+        with self._lock:
+            if path:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if path:
+            return path, None
+
+        build_dir = tempfile.mkdtemp(prefix='.build-', dir=self.root)
+        if language == 'c':
+            argv = ['gcc', *flags, source_path, '-o', os.path.join(build_dir, 'main')]
+            timeout = 10
+        else:
+            argv = ['javac', *flags, '-d', build_dir, source_path]
+            timeout = 20
+        try:
+            with metrics.span('compile'):
+                result = subprocess.run(argv, capture_output=True, text=True, timeout=timeout)
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        if result.returncode != 0:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None, result.stderr
+        return self.store(key, build_dir), None
+
+    def stats(self):
+        entries = 0
+        size = 0
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            entries += 1
+            size += sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _java_runner_command():
+    bootstrap_dir = tempfile.mkdtemp(prefix='quiz-sandbox-java-')
+    source = os.path.join(bootstrap_dir, 'SandboxRunner.java')
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write(JAVA_BOOTSTRAP)
+    subprocess.run(['javac', source], capture_output=True, check=True, timeout=60)
+    heap_mb = max(settings.SANDBOX_MEMORY_BYTES // (1024 * 1024), 32)
+    # Bounded metaspace and code cache reservations and a single-threaded GC
+    # keep the JVM inside SANDBOX_JAVA_MEMORY_BYTES/SANDBOX_JAVA_MAX_PROCESSES.
+    return ['java', f'-Xmx{heap_mb}m', '-XX:MaxMetaspaceSize=256m', '-XX:CompressedClassSpaceSize=128m',
+            '-XX:ReservedCodeCacheSize=64m', '-XX:+UseSerialGC', '-cp', bootstrap_dir, 'SandboxRunner']
+
+
+def _join_cgroup(pid):
+    cgroup = getattr(settings, 'SANDBOX_CGROUP', None)
+    if not cgroup:
+        return
+    try:
+        with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as f:
+            f.write(str(pid))
+    except OSError as e:
+        logger.warning("Could not move runner %s into cgroup %s: %s", pid, cgroup, e)
+
+
+def _kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+RSS_SAMPLE_INTERVAL = 0.02
+
+
+def _pump(proc, payload, timeout, max_output):
+    """
+    Feed `payload` to the runner and yield its output as it arrives.
+
+    Yields ('stdout' | 'stderr', bytes) chunks and finally ('exit', RunResult)
+    with empty stdout/stderr. Past `max_output` bytes the runner is killed and
+    the result marked truncated; past `timeout` seconds it is killed and
+    subprocess.TimeoutExpired raised. Closing the generator early kills the
+    runner too.
+
+    CPU time comes from wait4(). Peak RSS is sampled from the runner's VmHWM
+    while it runs, because ru_maxrss also counts the web worker's memory
+    inherited at fork.
+    """
+    deadline = time.monotonic() + timeout
+    peak_rss_kb = _vm_hwm_kb(proc.pid)
+    sampled_at = time.monotonic()
+    names = {proc.stdout: 'stdout', proc.stderr: 'stderr'}
+    output_bytes = 0
+    truncated = False
+    finished = False
+    rusage = None
+    offset = 0
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ)
+            selector.register(proc.stderr, selectors.EVENT_READ)
+            selector.register(proc.stdin, selectors.EVENT_WRITE)
+            while selector.get_map() and not truncated:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(proc.args, timeout)
+                events = selector.select(min(remaining, RSS_SAMPLE_INTERVAL))
+                if time.monotonic() - sampled_at >= RSS_SAMPLE_INTERVAL or not events:
+                    peak_rss_kb = max(peak_rss_kb, _vm_hwm_kb(proc.pid))
+                    sampled_at = time.monotonic()
+                for key, _ in events:
+                    if key.fileobj is proc.stdin:
+                        try:
+                            offset += os.write(key.fd, payload[offset:offset + select.PIPE_BUF])
+                        except BrokenPipeError:
+                            offset = len(payload)
+                        if offset >= len(payload):
+                            selector.unregister(proc.stdin)
+                            proc.stdin.close()
+                        continue
+                    data = os.read(key.fd, 32768)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        continue
+                    room = max_output - output_bytes
+                    output_bytes += len(data)
+                    if data[:room]:
+                        yield names[key.fileobj], data[:room]
+                    if output_bytes > max_output:
+                        truncated = True
+                        break
+            # Both pipes are closed, which the runner can do long before it
+            # exits, so the deadline still applies while waiting for it.
+            while not truncated:
+                rusage = _wait4(proc, os.WNOHANG)
+                if rusage:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(proc.args, timeout)
+                peak_rss_kb = max(peak_rss_kb, _vm_hwm_kb(proc.pid))
+                time.sleep(min(remaining, RSS_SAMPLE_INTERVAL))
+        finished = not truncated
+    finally:
+        if not finished:
+            _kill(proc)
+        cpu_time = _reap(proc, rusage)
+    yield 'exit', RunResult(
+        stdout='',
+        stderr='',
+        returncode=proc.returncode,
+        cpu_time=cpu_time,
+        peak_rss_kb=peak_rss_kb,
+        output_bytes=min(output_bytes, max_output),
+        truncated=truncated,
+    )
+
+
+def _collect(proc, payload, timeout, max_output):
+    """Run _pump() to completion and return the RunResult with its output."""
+    chunks = {'stdout': [], 'stderr': []}
+    for name, data in _pump(proc, payload, timeout, max_output):
+        if name == 'exit':
+            result = data
+        else:
+            chunks[name].append(data)
+    result.stdout = b''.join(chunks['stdout']).decode('utf-8', errors='replace')
+    result.stderr = b''.join(chunks['stderr']).decode('utf-8', errors='replace')
+    return result
+
+
+def _vm_hwm_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _wait4(proc, options=0):
+    """wait4() the runner and set its returncode; returns its rusage, or None if WNOHANG and it is still running."""
+    pid, status, rusage = os.wait4(proc.pid, options)
+    if not pid:
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return rusage
+
+
+def _reap(proc, rusage=None):
+    """Wait for the runner, unless `rusage` says it was already reaped, and return the CPU seconds it used."""
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        if not stream.closed:
+            stream.close()
+    rusage = rusage or _wait4(proc)
+    return rusage.ru_utime + rusage.ru_stime
+
+
+def get_pool(language):
+    """Return the RunnerPool for `language`, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(language)
+        if pool is None:
+            if language in ('python', 'c'):
+                # Compiled C binaries are exec'd by a warm Python runner, which
+                # already carries the rlimits.
+                command = ['python', '-c', PYTHON_BOOTSTRAP]
+            elif language == 'java':
+                command = _java_runner_command()
+            else:
+                raise ValueError(f'Unsupported language: {language}')
+            pool = RunnerPool(
+                language,
+                command=command,
+                limits=runner_limits(language),
+                max_output=settings.SANDBOX_MAX_OUTPUT_BYTES,
+                size=getattr(settings, 'SANDBOX_POOL_SIZE', 2),
+                max_concurrency=getattr(settings, 'SANDBOX_MAX_CONCURRENCY', 4),
+                max_queue=getattr(settings, 'SANDBOX_MAX_QUEUE', 16),
+                queue_timeout=getattr(settings, 'SANDBOX_QUEUE_TIMEOUT', 5.0),
+            )
+            _pools[language] = pool
+            threading.Thread(target=pool.warm, daemon=True).start()
+    return pool
+
+
+_compile_cache = None
+
+
+def get_compile_cache():
+    global _compile_cache
+    with _pools_lock:
+        if _compile_cache is None:
+            _compile_cache = CompileCache(
+                getattr(settings, 'SANDBOX_COMPILE_CACHE_DIR',
+                        os.path.join(tempfile.gettempdir(), 'quiz-compile-cache')),
+                getattr(settings, 'SANDBOX_COMPILE_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+            )
+    return _compile_cache
+
+
+def get_file_extension(language):
+    """Get the appropriate file extension for the language"""
+    extensions = {
+        'python': '.py',
+        'c': '.c',
+        'java': '.java'
+    }
+    return extensions.get(language, '.txt')
+
+
+def run_submission(code, language):
+    """
+    Write `code` to a temporary source file and run it; returns the same
+    (output, usage) pair as run_code.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='quiz-submission-')
+    try:
+        # Java needs the public class Main to live in Main.java.
+        name = 'Main.java' if language == 'java' else 'main' + get_file_extension(language)
+        file_path = os.path.join(temp_dir, name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        return run_code(file_path, language)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _toolchain_error(language):
+    if language == 'c' and not toolchain_available('gcc'):
+        return 'Error: C compiler (gcc) is not installed on the server. Please try Python code instead.'
+    if language == 'java' and not toolchain_available('javac'):
+        return 'Error: Java compiler (javac) is not installed on the server. Please install Java JDK to use this feature.'
+    return None
+
+
+def _runner_header(language, file_path):
+    """
+    Compile the source if the language needs it and return (header, None),
+    where header is what the warm runner is handed, or (None, compiler errors).
+    """
+    if language == 'python':
+        return file_path, None
+    # Identical sources reuse the cached build and skip the compiler.
+    artifact, errors = get_compile_cache().compile(language, file_path)
+    if errors is not None:
+        return None, errors
+    if language == 'c':
+        return f"EXEC\t{os.path.join(artifact, 'main')}", None
+    # The warm JVM loads Main from the class directory it is handed.
+    return artifact, None
+
+
+def run_code(file_path, language):
+    """
+    Compile (if needed) and run a source file. Returns (output text, usage)
+    where usage is RunResult.usage() for the run, or None if it never ran.
+    """
+    if language not in ('python', 'c', 'java'):
+        return 'Unsupported language', None
+    error = _toolchain_error(language)
+    if error:
+        return error, None
+
+    pool = get_pool(language)
+    timeout = 20 if language == 'java' else 10
+
+    # Compilation happens inside the slot too, so a burst of submissions
+    # queues (or is turned away) instead of piling up compilers.
+    with pool.slot():
+        try:
+            header, errors = _runner_header(language, file_path)
+            if errors is not None:
+                return f'Compilation Error:\n{errors}', None
+
+            result = pool.execute(header, timeout=timeout)
+
+            output = result.stdout
+            if result.truncated:
+                output += f'\n[Output truncated: program exceeded {pool.max_output} bytes of output]'
+            elif result.returncode != 0:
+                output += f'\nError (exit code {result.returncode}):\n{result.stderr}'
+
+            return output, result.usage()
+
+        except subprocess.TimeoutExpired:
+            return f'Execution timed out (limit: {timeout} seconds)', None
+        except Exception as e:
+            return f'Execution error: {str(e)}', None
+
+
+def stream_submission(code, language):
+    """
+    Run `code` and yield (event, data) pairs as it executes:
+
+    ('stdout' | 'stderr', text) for each chunk of output, then exactly one of
+    ('exit', {'exit_code', 'usage'}), ('timeout', {'limit'}),
+    ('compile_error', {'output'}) or ('error', {'error'}).
+
+    Output is never held in memory beyond one chunk, and the runner is killed
+    as soon as it passes SANDBOX_MAX_OUTPUT_BYTES (reported as
+    usage['output_truncated']) or the consumer stops iterating.
+    """
+    if language not in ('python', 'c', 'java'):
+        yield 'error', {'error': 'Unsupported language'}
+        return
+    error = _toolchain_error(language)
+    if error:
+        yield 'error', {'error': error}
+        return
+
+    pool = get_pool(language)
+    timeout = 20 if language == 'java' else 10
+    temp_dir = tempfile.mkdtemp(prefix='quiz-submission-')
+    try:
+        name = 'Main.java' if language == 'java' else 'main' + get_file_extension(language)
+        file_path = os.path.join(temp_dir, name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+
+        with pool.slot():
+            header, errors = _runner_header(language, file_path)
+            if errors is not None:
+                yield 'compile_error', {'output': f'Compilation Error:\n{errors}'}
+                return
+
+            # Chunks can split multi-byte characters, so decode incrementally.
+            decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace')
+                        for name in ('stdout', 'stderr')}
+            try:
+                for name, data in pool.stream(header, timeout=timeout):
+                    if name == 'exit':
+                        yield 'exit', {'exit_code': data.returncode, 'usage': data.usage()}
+                    else:
+                        text = decoders[name].decode(data)
+                        if text:
+                            yield name, text
+            except subprocess.TimeoutExpired:
+                yield 'timeout', {'limit': timeout}
+    except SandboxBusy as e:
+        yield 'error', {'error': str(e)}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def normalize_output(text):
+    """Ignore trailing whitespace on each line and trailing blank lines."""
+    return '\n'.join(line.rstrip() for line in text.rstrip().splitlines())
+
+
+def verdict_for(result, expected):
+    if result is None:
+        return 'not_run'
+    if result['exit_code'] is None:
+        return 'time_limit_exceeded'
+    if result['exit_code'] != 0:
+        return 'runtime_error'
+    if expected is not None and normalize_output(result['stdout']) != normalize_output(expected):
+        return 'wrong_answer'
+    return 'accepted'
+
+
+def run_batch(code, language, cases, time_limit=2.0):
+    """
+    Compile `code` once and run it against each case in `cases`, a list of
+    {'input': ..., 'expected_output': ...} dicts.
+
+    Every case gets a fresh warm runner of its own (see the module
+    docstring). Returns {'compile_error': str | None, 'results': [per-case
+    dict, ...], 'usage': resources used by the runners, or None}.
+    """
+    if language not in ('python', 'c', 'java'):
+        raise ValueError(f'Unsupported language: {language}')
+    if language == 'c' and not toolchain_available('gcc'):
+        return {'compile_error': 'C compiler (gcc) is not installed on the server.', 'results': [], 'usage': None}
+    if language == 'java' and not toolchain_available('javac'):
+        return {'compile_error': 'Java compiler (javac) is not installed on the server.', 'results': [], 'usage': None}
+
+    inputs = [case.get('input') or '' for case in cases]
+    pool = get_pool(language)
+    temp_dir = tempfile.mkdtemp(prefix='quiz-submission-')
+    try:
+        name = 'Main.java' if language == 'java' else 'main' + get_file_extension(language)
+        file_path = os.path.join(temp_dir, name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+
+        with pool.slot():
+            if language == 'python':
+                try:
+                    compile(code, name, 'exec')
+                except SyntaxError as e:
+                    return {'compile_error': f'{e.__class__.__name__}: {e}', 'results': [], 'usage': None}
+            header, errors = _runner_header(language, file_path)
+            if errors is not None:
+                return {'compile_error': errors, 'results': [], 'usage': None}
+            # A spare JVM handed a case may still be booting, and that counts
+            # against the case's wall-clock limit.
+            timeout = time_limit + (JAVA_STARTUP_ALLOWANCE if language == 'java' else 0)
+            runs = [_run_case(pool, header, data, timeout) for data in inputs]
+            raw = [case for case, _ in runs]
+            usage = _combined_usage([run_usage for _, run_usage in runs if run_usage])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    results = []
+    for index, case in enumerate(cases):
+        result = raw[index] if index < len(raw) else None
+        expected = case.get('expected_output')
+        entry = {'case': index, 'verdict': verdict_for(result, expected)}
+        if result is not None:
+            entry.update(result)
+            entry['time_ms'] = round(result['time_ms'], 3)
+        results.append(entry)
+    return {'compile_error': None, 'results': results, 'usage': usage}
+
+
+def _run_case(pool, header, data, time_limit):
+    start = time.perf_counter()
+    try:
+        result = pool.execute(header, stdin=data, timeout=time_limit)
+    except subprocess.TimeoutExpired:
+        return {'stdout': '', 'stderr': '', 'exit_code': None, 'time_ms': time_limit * 1000}, None
+    return {
+        'stdout': result.stdout,
+        'stderr': result.stderr,
+        'exit_code': result.returncode,
+        'time_ms': (time.perf_counter() - start) * 1000,
+    }, result.usage()
+
+
+def _combined_usage(usages):
+    if not usages:
+        return None
+    return {
+        'cpu_time_ms': round(sum(usage['cpu_time_ms'] for usage in usages), 3),
+        'peak_rss_kb': max(usage['peak_rss_kb'] for usage in usages),
+        'output_bytes': sum(usage['output_bytes'] for usage in usages),
+        'output_truncated': any(usage['output_truncated'] for usage in usages),
+    }
+
+
+@atexit.register
+def _close_pools():
+    for pool in list(_pools.values()):
+        pool.close()
@@ -0,0 +1,195 @@
+"""
+Scoring for submitted answers.
+
+Points move only when an answer's correctness actually changes: a first
+correct answer or a wrong-to-right resubmission adds POINTS_PER_CORRECT, a
+right-to-wrong resubmission takes them back, and anything else leaves the
+score alone. Score changes are applied as a single
+UPDATE ... SET total_score = total_score + delta, so concurrent submissions
+cannot overwrite each other's points.
+
+submit_answer() grades from cached answer state and writes conditionally on
+it, so a quiz session's stream of single answers costs one write each.
+
+Both functions lock the student's row before touching any of their answers
+(select_for_update; SQLite's BEGIN IMMEDIATE serialises writers anyway), so
+a single and a bulk submission for the same student queue up instead of
+deadlocking on each other's rows.
+
+submit_answers() grades a whole quiz upload the same way in a fixed number of
+queries: one read of existing answers, a bulk_create, a bulk_update and a
+single score update.
+
+Both grade against question_bank.answer_key(), an in-memory index, so no
+Question rows are read. A student with a quiz session may only answer the
+questions drawn for them (see quiz_sets.py); the drawn set is cached with
+the answer state.
+"""
+import functools
+
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from . import answer_state, live_leaderboard, question_bank
+from .models import Question, Student, StudentAnswer
+
+POINTS_PER_CORRECT = 5
+
+
+def is_correct_option(chosen_option, correct_option):
+    return chosen_option.strip().upper() == correct_option.strip().upper()
+
+
+def score_delta(was_correct, is_correct):
+    """Points to add when an answer goes from `was_correct` (None if new) to `is_correct`."""
+    if bool(was_correct) == is_correct:
+        return 0
+    return POINTS_PER_CORRECT if is_correct else -POINTS_PER_CORRECT
+
+
+def apply_score_delta(student_id, delta):
+    if delta:
+        Student.objects.filter(id=student_id).update(total_score=F('total_score') + delta)
+        transaction.on_commit(live_leaderboard.notify)
+
+
+def submit_answer(student_id, question_id, chosen_option):
+    """
+    Record one answer and return (is_correct, current_score).
+
+    Grading and the previous answer come from the cached answer state (see
+    answer_state.py); the database sees the student row lock, one
+    conditional write and the score update on a real transition.
+    Raises Student.DoesNotExist or Question.DoesNotExist for unknown ids, and
+    Question.DoesNotExist for a question outside the student's quiz session.
+    """
+    student_id, question_id = int(student_id), int(question_id)
+    with transaction.atomic(savepoint=False):
+        score = _lock_student(student_id)
+        answers = answer_state.answered(student_id)
+        correct_option = question_bank.answer_key().get(question_id)
+        if correct_option is None:
+            # Possibly added since this worker cached the key.
+            correct_option = question_bank.answer_key(refresh=True).get(question_id)
+        if correct_option is None:
+            raise Question.DoesNotExist(f"Question {question_id} not found")
+        allowed = answer_state.question_set(student_id)
+        if allowed is not None and question_id not in allowed:
+            raise Question.DoesNotExist(f"Question {question_id} is not part of this student's quiz")
+
+        is_correct = is_correct_option(chosen_option, correct_option)
+        while not _write_answer(student_id, question_id, chosen_option, is_correct,
+                                answers.get(question_id)):
+            # Another worker changed this answer since it was cached.
+            answers = answer_state.answered(student_id, refresh=True)
+        previous = answers.get(question_id)
+        was_correct = previous[1] if previous else None
+
+        delta = score_delta(was_correct, is_correct)
+        apply_score_delta(student_id, delta)
+        # The row is locked, so nothing else has changed the score meanwhile.
+        score += delta
+
+        answers[question_id] = (chosen_option, is_correct)
+        transaction.on_commit(functools.partial(answer_state.store, student_id, answers))
+    return is_correct, score
+
+
+def _lock_student(student_id):
+    """Lock the student's row for the transaction and return their score; raises Student.DoesNotExist."""
+    score = (Student.objects.select_for_update().filter(id=student_id)
+             .values_list('total_score', flat=True).first())
+    if score is None:
+        raise Student.DoesNotExist(f"Student {student_id} not found")
+    return score
+
+
+def _write_answer(student_id, question_id, chosen_option, is_correct, previous):
+    """
+    Write the student's answer, provided the stored one still matches
+    `previous` (a (chosen_option, is_correct) pair, or None for no answer).
+    Returns False, writing nothing, when it does not.
+
+    Updates are compare-and-swap on the old is_correct value, so an answer
+    cached stale by another worker is caught instead of overwritten.
+    """
+    if previous is not None:
+        return bool(StudentAnswer.objects.filter(student_id=student_id, question_id=question_id,
+                                                 is_correct=previous[1])
+                    .update(chosen_option=chosen_option, is_correct=is_correct))
+    # Relies on unique_student_answer: an answer the cache did not know of
+    # makes this insert a no-op instead of a duplicate row.
+    connection = connections[router.db_for_write(StudentAnswer)]
+    table = connection.ops.quote_name(StudentAnswer._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (student_id, question_id, chosen_option, is_correct) '
+            f'VALUES (%s, %s, %s, %s) ON CONFLICT (student_id, question_id) DO NOTHING',
+            [student_id, question_id, chosen_option, is_correct],
+        )
+        return cursor.rowcount == 1
+
+
+def submit_answers(student_id, answers):
+    """
+    Record a batch of {'question_id', 'chosen_option'} answers for one student.
+
+    Returns (results, current_score) where results has one entry per
+    submitted answer, in order. Unknown questions and ones outside the
+    student's quiz session are reported per entry and skipped; if a question appears twice, the last answer wins.
+    Raises Student.DoesNotExist for an unknown student.
+    """
+    with transaction.atomic(savepoint=False):
+        score = _lock_student(student_id)
+
+        question_ids = {answer['question_id'] for answer in answers}
+        answer_key = question_bank.answer_key()
+        if not question_ids <= answer_key.keys():
+            answer_key = question_bank.answer_key(refresh=True)
+        allowed = answer_state.question_set(student_id)
+        existing = {answer.question_id: answer for answer in
+                    StudentAnswer.objects.filter(student_id=student_id,
+                                                 question_id__in=question_ids & answer_key.keys())
+                    .only('id', 'question_id', 'chosen_option', 'is_correct')}
+
+        latest = {}
+        results = []
+        for answer in answers:
+            question_id = answer['question_id']
+            if question_id not in answer_key:
+                results.append({'question_id': question_id, 'error': 'Question not found'})
+                continue
+            if allowed is not None and question_id not in allowed:
+                results.append({'question_id': question_id, 'error': "Question not part of this student's quiz"})
+                continue
+            is_correct = is_correct_option(answer['chosen_option'], answer_key[question_id])
+            latest[question_id] = (answer['chosen_option'], is_correct)
+            results.append({'question_id': question_id, 'is_correct': is_correct})
+
+        delta = 0
+        to_create = []
+        to_update = []
+        for question_id, (chosen_option, is_correct) in latest.items():
+            previous = existing.get(question_id)
+            if previous is None:
+                delta += score_delta(None, is_correct)
+                to_create.append(StudentAnswer(student_id=student_id, question_id=question_id,
+                                               chosen_option=chosen_option, is_correct=is_correct))
+            elif (previous.chosen_option, previous.is_correct) != (chosen_option, is_correct):
+                delta += score_delta(previous.is_correct, is_correct)
+                previous.chosen_option = chosen_option
+                previous.is_correct = is_correct
+                to_update.append(previous)
+
+        if to_create:
+            # No answer can have been added since `existing` was read:
+            # submit_answer() waits for the student row lock held here.
+            StudentAnswer.objects.bulk_create(to_create)
+        if to_update:
+            StudentAnswer.objects.bulk_update(to_update, ['chosen_option', 'is_correct'])
+        if delta:
+            apply_score_delta(student_id, delta)
+            score = Student.objects.filter(id=student_id).values_list('total_score', flat=True).get()
+        # bulk_create/bulk_update send no signals.
+        transaction.on_commit(functools.partial(answer_state.forget, student_id))
+    return results, score
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Student, Question, StudentAnswer
+from .models import Student, Question, StudentAnswer, CodeJob
 
 class StudentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,12 +8,21 @@ class StudentSerializer(serializers.ModelSerializer):
 
 
 class QuestionSerializer(serializers.ModelSerializer):
+    # correct_option stays server-side; grading uses question_bank.answer_key().
     class Meta:
         model = Question
-        fields = ['id', 'text', 'code_snippet', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_option']
+        fields = ['id', 'category', 'text', 'code_snippet', 'option_a', 'option_b', 'option_c', 'option_d']
 
 
 class StudentAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentAnswer
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class CodeJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+
+    class Meta:
+        model = CodeJob
+        fields = ['job_id', 'language', 'status', 'output', 'created_at', 'started_at', 'finished_at']
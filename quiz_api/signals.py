@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import answer_state, live_leaderboard, metrics, question_bank
+from .models import Question, QuizSession, Student, StudentAnswer
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, **kwargs):
+    # Wait for the admin's transaction to commit, or a concurrent request
+    # could re-cache the bank from the old rows.
+    transaction.on_commit(question_bank.invalidate)
+
+
+@receiver([post_save, post_delete], sender=StudentAnswer)
+def answer_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: answer_state.forget(instance.student_id))
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: answer_state.forget(instance.id))
+
+
+@receiver([post_save, post_delete], sender=QuizSession)
+def quiz_session_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: answer_state.forget_question_set(instance.student_id))
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, **kwargs):
+    transaction.on_commit(live_leaderboard.notify)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # First in the list: connection.execute_wrapper() blocks pop() the last
+    # entry on exit, and this connection may have been opened inside one.
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, metrics.record_query)
+
@@ -1,3 +1,256 @@
-from django.test import TestCase
+import contextlib
+import io
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+import manage_db
+
+from . import answer_state, mailer, question_bank, quiz_sets
+from .management.commands import process_tasks
+from .models import CodeJob, Question, QuizSession, ResultNotification, Student, StudentAnswer
+
+
+class AnswerSubmissionTests(TestCase):
+    def setUp(self):
+        caches[settings.ANSWER_STATE_CACHE].clear()
+        self.addCleanup(caches[settings.ANSWER_STATE_CACHE].clear)
+        self.student = Student.objects.create(name='Ada', email='ada@example.com', department='CS',
+                                              college='Test', year='1st Year')
+        self.question = Question.objects.create(text='1 + 1?', option_a='1', option_b='2', option_c='3',
+                                                option_d='4', correct_option='B')
+        # The signals invalidate on commit, which a TestCase never reaches.
+        question_bank.invalidate()
+        self.addCleanup(question_bank.invalidate)
+
+    def submit(self, chosen_option, question_id=None, student_id=None):
+        return self.client.post('/api/submit-answer/', {
+            'student_id': student_id or self.student.id,
+            'question_id': question_id or self.question.id,
+            'chosen_option': chosen_option,
+        }, content_type='application/json')
+
+    def submit_all(self, answers, student_id=None):
+        return self.client.post('/api/submit-answers/', {
+            'student_id': student_id or self.student.id,
+            'answers': [{'question_id': question_id, 'chosen_option': option} for question_id, option in answers],
+        }, content_type='application/json')
+
+    def assertStored(self, chosen_option, is_correct, score):
+        answer = StudentAnswer.objects.get(student=self.student, question=self.question)
+        self.assertEqual((answer.chosen_option, answer.is_correct), (chosen_option, is_correct))
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.total_score, score)
+
+    def test_first_answer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.submit('b')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'is_correct': True, 'current_score': 5})
+        self.assertStored('b', True, 5)
+
+    def test_resubmissions_move_points_only_on_a_change(self):
+        for option, is_correct, score in [('B', True, 5), ('A', False, 0), ('C', False, 0), ('B', True, 5),
+                                          ('B', True, 5)]:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.submit(option)
+            self.assertEqual(response.json(), {'is_correct': is_correct, 'current_score': score})
+        self.assertStored('B', True, 5)
+        self.assertEqual(StudentAnswer.objects.count(), 1)
+
+    def test_stale_cached_answer_is_reloaded(self):
+        # Another worker answered correctly; this one still caches a wrong answer.
+        StudentAnswer.objects.create(student=self.student, question=self.question, chosen_option='B',
+                                     is_correct=True)
+        Student.objects.filter(id=self.student.id).update(total_score=5)
+        answer_state.store(self.student.id, {self.question.id: ('A', False)})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.submit('A')
+        self.assertEqual(response.json(), {'is_correct': False, 'current_score': 0})
+        self.assertStored('A', False, 0)
+        self.assertEqual(answer_state.answered(self.student.id), {self.question.id: ('A', False)})
+
+    def test_batch_with_a_question_twice_keeps_the_last_answer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.submit_all([(self.question.id, 'A'), (self.question.id, 'B')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'results': [{'question_id': self.question.id, 'is_correct': False},
+                        {'question_id': self.question.id, 'is_correct': True}],
+            'current_score': 5,
+        })
+        self.assertStored('B', True, 5)
+
+    def test_unknown_student_or_question(self):
+        missing = self.question.id + 1000
+        self.assertEqual(self.submit('B', student_id=self.student.id + 1000).status_code, 404)
+        self.assertEqual(self.submit('B', question_id=missing).status_code, 404)
+        self.assertEqual(self.submit_all([(self.question.id, 'B')], student_id=self.student.id + 1000).status_code,
+                         404)
+        response = self.submit_all([(missing, 'B'), (self.question.id, 'B')])
+        self.assertEqual(response.json(), {
+            'results': [{'question_id': missing, 'error': 'Question not found'},
+                        {'question_id': self.question.id, 'is_correct': True}],
+            'current_score': 5,
+        })
+        self.assertFalse(StudentAnswer.objects.filter(question_id=missing).exists())
+
+
+class DrawTests(SimpleTestCase):
+    pool = {'python': (1, 2, 3), 'sql': (4, 5, 6)}
+
+    def test_count_and_quotas(self):
+        for count, quotas, size in ((0, None, 6), (0, {'python': 1}, 6), (2, None, 2), (4, {'sql': 3}, 4),
+                                    (2, {'python': 2, 'sql': 2}, 4), (10, None, 6)):
+            with self.subTest(count=count, quotas=quotas):
+                ids = quiz_sets.draw(self.pool, 7, count, quotas)
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(len(ids), size)
+                for category, quota in (quotas or {}).items():
+                    self.assertGreaterEqual(len(set(ids) & set(self.pool[category])), quota)
+        self.assertEqual(quiz_sets.draw(self.pool, 7, 3, {'sql': 1}), quiz_sets.draw(self.pool, 7, 3, {'sql': 1}))
+
+
+class RunTestCasesValidationTests(TestCase):
+    def test_bad_cases_and_time_limits_are_rejected(self):
+        for payload in ({'cases': [{'input': '1', 'expected_output': 4}]},
+                        {'cases': [{'input': ['1'], 'expected_output': '2'}]},
+                        {'cases': [{'input': '1'}], 'time_limit': -1},
+                        {'cases': [{'input': '1'}], 'time_limit': 0},
+                        {'cases': [{'input': '1'}], 'time_limit': 'NaN'}):
+            with self.subTest(payload=payload):
+                response = self.client.post('/api/compile/batch/', {'code': 'print(2)', **payload},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+
+class CodeJobQueueTests(TestCase):
+    def test_job_left_running_by_a_dead_worker_is_reclaimed(self):
+        stale = CodeJob.objects.create(code='print(1)', status=CodeJob.RUNNING,
+                                       started_at=timezone.now() - timedelta(seconds=process_tasks.LEASE_SECONDS + 1))
+        busy = CodeJob.objects.create(code='print(2)', status=CodeJob.RUNNING, started_at=timezone.now())
+        claimed = process_tasks.Command().claim_next()
+        self.assertEqual(claimed.id, stale.id)
+        self.assertEqual(claimed.status, CodeJob.RUNNING)
+        self.assertGreater(claimed.started_at, stale.started_at)
+        self.assertIsNone(process_tasks.Command().claim_next())
+        busy.refresh_from_db()
+        self.assertEqual(busy.status, CodeJob.RUNNING)
+
+    def test_late_result_does_not_overwrite_a_reclaimed_job(self):
+        job = CodeJob.objects.create(code='print(1)', status=CodeJob.RUNNING, started_at=timezone.now())
+        CodeJob.objects.filter(id=job.id).update(started_at=timezone.now() + timedelta(seconds=1))
+        with self.assertLogs('quiz_api.management.commands.process_tasks', 'WARNING'):
+            process_tasks.Command().run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.output, job.finished_at), (CodeJob.RUNNING, '', None))
+
+    def test_stream_needs_asgi(self):
+        job = CodeJob.objects.create(code='print(1)')
+        self.assertEqual(self.client.get(f'/api/compile/jobs/{job.id}/stream/').status_code, 501)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAIL_MAX_ATTEMPTS=3,
+                   MAIL_RETRY_BASE_SECONDS=60)
+class ResultEmailTests(TestCase):
+    def setUp(self):
+        self.student = Student.objects.create(name='Ada', email='ada@example.com', department='CS',
+                                              college='Test', year='1st Year')
+
+    @contextlib.contextmanager
+    def failing_send(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=smtplib.SMTPException('mailbox unavailable')), \
+                self.assertLogs('quiz_api.mailer', 'WARNING'):
+            yield
+
+    def test_batch_is_sent(self):
+        notifications = [mailer.queue_result_email(self.student, score) for score in (3, 4, 5)]
+        self.assertEqual(mailer.dispatch_pending(batch_size=2), (2, 0))
+        self.assertEqual(mailer.dispatch_pending(batch_size=2), (1, 0))
+        self.assertEqual(mailer.dispatch_pending(), (0, 0))
+        self.assertEqual(sorted(message.body[-2:] for message in mail.outbox), ['3.', '4.', '5.'])
+        self.assertEqual(mail.outbox[0].to, ['ada@example.com'])
+        for notification in notifications:
+            notification.refresh_from_db()
+            self.assertEqual((notification.status, notification.attempts), (ResultNotification.SENT, 1))
+            self.assertIsNotNone(notification.sent_at)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        notification = mailer.queue_result_email(self.student, 5)
+        before = timezone.now()
+        with self.failing_send():
+            self.assertEqual(mailer.dispatch_pending(), (0, 1))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), (ResultNotification.PENDING, 1))
+        self.assertGreaterEqual(notification.next_attempt_at, before + timedelta(seconds=60))
+        self.assertLess(notification.next_attempt_at, before + timedelta(seconds=120))
+        self.assertEqual(notification.last_error, 'mailbox unavailable')
+        # Not due again until the backoff has passed.
+        self.assertEqual(mailer.dispatch_pending(), (0, 0))
+
+        ResultNotification.objects.update(next_attempt_at=timezone.now())
+        before = timezone.now()
+        with self.failing_send():
+            mailer.dispatch_pending()
+        notification.refresh_from_db()
+        self.assertEqual(notification.attempts, 2)
+        self.assertGreaterEqual(notification.next_attempt_at, before + timedelta(seconds=120))
+
+        ResultNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(mailer.dispatch_pending(), (1, 0))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.last_error), (ResultNotification.SENT, ''))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_row_fails_after_max_attempts(self):
+        notification = mailer.queue_result_email(self.student, 5)
+        with self.failing_send():
+            for _ in range(settings.MAIL_MAX_ATTEMPTS):
+                ResultNotification.objects.update(next_attempt_at=timezone.now())
+                self.assertEqual(mailer.dispatch_pending(), (0, 1))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts),
+                         (ResultNotification.FAILED, settings.MAIL_MAX_ATTEMPTS))
+        ResultNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(mailer.dispatch_pending(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+class BackupRestoreTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def _rows(self):
+        return {model._meta.db_table: list(model._base_manager.order_by('pk').values_list())
+                for model in manage_db._models()}
+
+    def test_restore_keeps_every_row_and_timestamp(self):
+        student = Student.objects.create(name='Ada', email='ada@example.com', department='CS',
+                                         college='Test', year='1st Year')
+        question = Question.objects.create(text='1 + 1?', option_a='1', option_b='2', option_c='3',
+                                           option_d='4', correct_option='B')
+        StudentAnswer.objects.create(student=student, question=question, chosen_option='B', is_correct=True)
+        QuizSession.objects.create(student=student, seed=42, question_ids=str(question.id))
+        CodeJob.objects.create(code='print(1)')
+        ResultNotification.objects.create(student=student, recipient=student.email, subject='Result', body='2/2')
+        last_week = timezone.now() - timedelta(days=7)
+        for model in (QuizSession, CodeJob, ResultNotification):
+            model.objects.update(created_at=last_week)
+        before = self._rows()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = manage_db.backup_database(self.directory)
+            manage_db.restore_database(path, workers=2, flush=True)
+
+        self.assertEqual(self._rows(), before)
+        self.assertEqual(CodeJob.objects.get().created_at, last_week)
@@ -1,7 +1,10 @@
 import logging
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+from django.views.decorators.gzip import gzip_page
 from rest_framework.authtoken.models import Token
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
@@ -11,8 +14,15 @@ from rest_framework.decorators import api_view
 from django.shortcuts import get_object_or_404
 import json
 from django.utils.decorators import method_decorator
-from .models import Student, Question, StudentAnswer
-from .serializers import StudentSerializer, QuestionSerializer, StudentAnswerSerializer
+from . import leaderboard as ranking
+from . import live_leaderboard
+from . import mailer
+from . import metrics
+from . import question_bank
+from . import quiz_sets
+from . import scoring
+from .models import Student, Question
+from .serializers import StudentAnswerSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -62,14 +72,47 @@ def delete_student(request, pk):
         return Response({'error': 'Student not found'}, status=404)
 
 
+@transaction.non_atomic_requests
 @api_view(['GET'])
 def get_questions(request):
     """
     Retrieve all quiz questions.
+
+    The payload is pre-rendered and cached (see question_bank.py) and carries
+    a strong ETag, so clients that already hold the current bank get a 304.
+    """
+    payload, etag = question_bank.get_payload()
+    return questions_response(request, payload, etag)
+
+
+def questions_response(request, payload, etag):
+    """The question bank payload, or a 304 if the client's ETag is current."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = etag
+    # Always revalidate, so an admin edit reaches clients on their next fetch.
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@api_view(['POST'])
+def start_quiz(request):
+    """
+    Start (or resume) a student's quiz: the questions drawn for them, in order.
+
+    Expects {"student_id"}. The first call draws the set (see quiz_sets.py);
+    later calls return the same one.
     """
-    questions = Question.objects.all()
-    serializer = QuestionSerializer(questions, many=True)
-    return Response(serializer.data)
+    try:
+        question_ids = quiz_sets.start(int(request.data.get('student_id')))
+    except Student.DoesNotExist as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except (TypeError, ValueError):
+        return Response({'error': 'student_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return HttpResponse(quiz_sets.render(question_ids), content_type='application/json')
 
 
 @api_view(['POST'])
@@ -81,38 +124,129 @@ def submit_answer(request):
     question_id = request.data.get('question_id')
     chosen_option = request.data.get('chosen_option')
 
-    student = get_object_or_404(Student, id=student_id)
-    question = get_object_or_404(Question, id=question_id)
+    if not isinstance(chosen_option, str) or not chosen_option:
+        return Response({'error': 'chosen_option is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check correctness
-    is_correct = (chosen_option.upper() == question.correct_option.upper())
+    try:
+        is_correct, current_score = scoring.submit_answer(student_id, question_id, chosen_option)
+    except (Student.DoesNotExist, Question.DoesNotExist) as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except (TypeError, ValueError):
+        return Response({'error': 'student_id and question_id must be integers'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'is_correct': is_correct,
+        'current_score': current_score
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def submit_answers(request):
+    """
+    Submit all of a student's answers in one request.
+
+    Expects {"student_id", "answers": [{"question_id", "chosen_option"}, ...]}.
+    """
+    student_id = request.data.get('student_id')
+    answers = request.data.get('answers')
 
-    # Create or update the StudentAnswer
-    answer, created = StudentAnswer.objects.update_or_create(
-        student=student,
-        question=question,
-        defaults={'chosen_option': chosen_option, 'is_correct': is_correct}
-    )
+    if not isinstance(answers, list) or not answers:
+        return Response({'error': 'answers must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(answers) > settings.MAX_ANSWERS_PER_SUBMISSION:
+        return Response({'error': f'At most {settings.MAX_ANSWERS_PER_SUBMISSION} answers per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        answers = [{'question_id': int(answer['question_id']), 'chosen_option': answer['chosen_option']}
+                   for answer in answers]
+    except (KeyError, TypeError, ValueError):
+        return Response({'error': 'Each answer needs an integer question_id and a chosen_option'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(answer['chosen_option'], str) and answer['chosen_option'] for answer in answers):
+        return Response({'error': 'Each answer needs a chosen_option'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # If correct, add 5 points
-    if is_correct:
-        student.total_score += 5
-        student.save()
+    try:
+        results, current_score = scoring.submit_answers(student_id, answers)
+    except Student.DoesNotExist as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except (TypeError, ValueError):
+        return Response({'error': 'student_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
 
     return Response({
-        'is_correct': is_correct,
-        'current_score': student.total_score
+        'results': results,
+        'current_score': current_score
     }, status=status.HTTP_200_OK)
 
 
+def _int_param(params, name, default, maximum=None):
+    try:
+        value = max(int(params.get(name, default)), 0)
+    except ValueError:
+        value = default
+    return min(value, maximum) if maximum is not None else value
+
+
+def _leaderboard_params(params):
+    """(limit, offset, fields, after) for a leaderboard request; ValueError with a message for bad ones."""
+    limit = _int_param(params, 'limit', settings.LEADERBOARD_PAGE_SIZE, settings.LEADERBOARD_MAX_PAGE_SIZE)
+    offset = _int_param(params, 'offset', 0)
+    fields = ranking.parse_fields(params.get('fields'))
+    after = None
+    if params.get('after'):
+        try:
+            after = ranking.parse_cursor(params['after'])
+        except ValueError:
+            raise ValueError("Invalid after cursor; use the one from the Link header.") from None
+    elif offset > settings.LEADERBOARD_MAX_OFFSET:
+        raise ValueError(f"offset is limited to {settings.LEADERBOARD_MAX_OFFSET}; "
+                         f"page further with the after cursor from the Link header.")
+    return limit, offset, fields, after
+
+
+def _with_next_link(request, response, cursor):
+    """Point a Link: rel="next" header at the page after `cursor`, if there is one."""
+    if cursor is not None:
+        params = request.GET.copy()
+        params.pop('offset', None)
+        params['after'] = cursor
+        response['Link'] = f'<{request.path}?{params.urlencode(safe=",")}>; rel="next"'
+    return response
+
+
+@transaction.non_atomic_requests
+@gzip_page
 @api_view(['GET'])
 def leaderboard(request):
     """
-    Return students ordered by total_score descending.
+    Return students ordered by total_score descending, one page at a time.
+
+    ?limit= (default LEADERBOARD_PAGE_SIZE, at most LEADERBOARD_MAX_PAGE_SIZE)
+    and ?offset= (at most LEADERBOARD_MAX_OFFSET) select the page; a full
+    page's Link: rel="next" header carries an ?after= cursor for the next
+    one, at any depth. ?fields= picks columns from leaderboard.FIELDS
+    (default id, name, total_score, rank).
+    """
+    try:
+        limit, offset, fields, after = _leaderboard_params(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows, cursor = ranking.top(limit, offset, fields, after)
+    return _with_next_link(request, HttpResponse(ranking.encode(rows), content_type='application/json'), cursor)
+
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+def leaderboard_rank(request, student_id):
+    """
+    Return one student's rank and score without loading the board.
     """
-    students = Student.objects.all().order_by('-total_score')
-    serializer = StudentSerializer(students, many=True)
-    return Response(serializer.data)
+    student = get_object_or_404(Student, id=student_id)
+    return Response({
+        'student_id': student.id,
+        'rank': ranking.rank_of(student),
+        'total_score': student.total_score,
+    })
 
 
 @api_view(['POST'])
@@ -127,49 +261,42 @@ def complete_quiz(request):
     
     # Retrieve the student or return an error if not found
     try:
-        student = Student.objects.get(id=student_id)
+        student = Student.objects.only('id', 'name', 'email').get(id=student_id)
     except Student.DoesNotExist:
         logger.error(f"Student with id {student_id} not found.")
         return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
     
     # Update the student's total score
-    student.total_score = score
-    student.save()
+    Student.objects.filter(id=student.id).update(total_score=score)
+    transaction.on_commit(live_leaderboard.notify)
 
-    # Compose the email
-    subject = "Your Quiz Results"
-    message = f"Hello {student.name},\n\nThank you for completing the quiz! Your final score is {score}."
-    recipient_list = [student.email]
-
-    # Send the email
-    try:
-        send_mail(subject, message, settings.EMAIL_HOST_USER, recipient_list)
-    except Exception as e:
-        logger.error("Email could not be sent: " + str(e))
-        return Response({"error": "Email could not be sent", "details": str(e)},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # The email is sent by the background mailer, not on the request path;
+    # queueing it here commits it together with the score.
+    mailer.queue_result_email(student, score)
 
-    return Response({"message": "Quiz completed and email sent!"}, status=status.HTTP_200_OK)
+    return Response({"message": "Quiz completed! Your results will be emailed shortly."}, status=status.HTTP_200_OK)
 
 
 # Add this import at the top with your other imports
-import subprocess
-import tempfile
-import os
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from rest_framework import status
-import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+import time
+from .models import CodeJob
+from .sandbox import SandboxBusy, get_compile_cache, run_batch, run_submission, stream_submission
+from .serializers import CodeJobSerializer
+
+# How long a /stream/ request follows a job before the client has to reconnect.
+CODE_JOB_STREAM_SECONDS = 60
 
 # Add this new view function
+@transaction.non_atomic_requests
 @api_view(['POST'])
 def compile_code(request):
     """
     Compile and run code in various languages
     """
-    temp_file_path = None
-    temp_dir = None
-
     try:
         data = json.loads(request.body)
         code = data.get('code', '')
@@ -178,132 +305,181 @@ def compile_code(request):
         if not code:
             return Response({'error': 'No code provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if language == 'java':
-            temp_dir = tempfile.mkdtemp()
-            temp_file_path = os.path.join(temp_dir, 'Main.java')
-            with open(temp_file_path, 'w', encoding='utf-8') as temp_file:
-                temp_file.write(code)
-        else:
-            with tempfile.NamedTemporaryFile(suffix=get_file_extension(language), delete=False, mode='w', encoding='utf-8') as temp_file:
-                temp_file.write(code)
-                temp_file_path = temp_file.name
-
         # Compile and run the code
-        result = run_code(temp_file_path, language)
+        result, usage = run_submission(code, language)
 
-        return Response({'output': result})
+        return Response({'output': result, 'usage': usage})
 
+    except SandboxBusy as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': '2'})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _iterate_in_thread(iterator):
+    """
+    Serve a blocking iterator to the ASGI handler one item at a time;
+    Django would otherwise drain a sync iterator completely before sending.
+    """
+    sentinel = object()
+    try:
+        while True:
+            item = await sync_to_async(next, thread_sensitive=False)(iterator, sentinel)
+            if item is sentinel:
+                return
+            yield item
     finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-
-        if language == 'java' and temp_dir and os.path.isdir(temp_dir):
-            try:
-                # Clean up class files if any were generated
-                class_file = os.path.join(temp_dir, 'Main.class')
-                if os.path.exists(class_file):
-                    os.unlink(class_file)
-            except:
-                pass
-
-            try:
-                os.rmdir(temp_dir)
-            except:
-                pass
-
-
-def get_file_extension(language):
-    """Get the appropriate file extension for the language"""
-    extensions = {
-        'python': '.py',
-        'c': '.c',
-        'java': '.java'
-    }
-    return extensions.get(language, '.txt')
-
-
-def run_code(file_path, language):
+        await sync_to_async(iterator.close, thread_sensitive=False)()
+
+
+def _event_stream(request, events):
+    if isinstance(request, ASGIRequest) and not hasattr(events, '__aiter__'):
+        events = _iterate_in_thread(events)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies (nginx) from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@transaction.non_atomic_requests
+@api_view(['POST'])
+def compile_code_stream(request):
+    """
+    Compile and run code, streaming its output as Server-Sent Events.
+
+    Emits `stdout`/`stderr` events as output arrives and ends with one of
+    `exit`, `timeout`, `compile_error` or `error`.
+    """
+    code = request.data.get('code', '')
+    language = request.data.get('language', 'python')
+
+    if not code:
+        return Response({'error': 'No code provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    events = (_sse(event, data) for event, data in stream_submission(code, language))
+    return _event_stream(request._request, events)
+
+
+@transaction.non_atomic_requests
+@api_view(['POST'])
+def run_test_cases(request):
+    """
+    Compile code once and run it against a list of test cases.
+
+    Expects {"code", "language", "cases": [{"input", "expected_output"}, ...]}
+    and returns a verdict, output and timing for every case.
+    """
+    code = request.data.get('code', '')
+    language = request.data.get('language', 'python')
+    cases = request.data.get('cases')
+    time_limit = request.data.get('time_limit', 2)
+
+    if not code:
+        return Response({'error': 'No code provided'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(cases, list) or not cases or not all(isinstance(case, dict) for case in cases):
+        return Response({'error': 'cases must be a non-empty list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(cases) > settings.SANDBOX_MAX_BATCH_CASES:
+        return Response({'error': f'At most {settings.SANDBOX_MAX_BATCH_CASES} cases per run'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(case.get(field), (str, type(None))) for case in cases
+               for field in ('input', 'expected_output')):
+        return Response({'error': 'input and expected_output must be strings'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        if language == 'python':
-            result = subprocess.run(['python', file_path],
-                                    capture_output=True,
-                                    text=True,
-                                    timeout=10)
-
-        elif language == 'c':
-            try:
-                subprocess.run(['gcc', '--version'], capture_output=True, check=True)
-            except (subprocess.SubprocessError, FileNotFoundError):
-                return 'Error: C compiler (gcc) is not installed on the server. Please try Python code instead.'
-
-            output_path = file_path.replace('.c', '.exe')
-            compile_result = subprocess.run(['gcc', file_path, '-o', output_path],
-                                            capture_output=True,
-                                            text=True,
-                                            timeout=10)
-
-            if compile_result.returncode != 0:
-                return f'Compilation Error:\n{compile_result.stderr}'
-
-            result = subprocess.run([output_path],
-                                    capture_output=True,
-                                    text=True,
-                                    timeout=10)
-
-            try:
-                os.unlink(output_path)
-            except:
-                pass
-
-        elif language == 'java':
-            try:
-                subprocess.run(['javac', '-version'], capture_output=True, check=True)
-            except (subprocess.SubprocessError, FileNotFoundError):
-                return 'Error: Java compiler (javac) is not installed on the server. Please install Java JDK to use this feature.'
-
-            working_dir = os.path.dirname(file_path)
-
-            compile_result = subprocess.run(['javac', file_path],
-                                            capture_output=True,
-                                            text=True,
-                                            timeout=20,
-                                            cwd=working_dir)
-
-            if compile_result.returncode != 0:
-                return f'Compilation Error:\n{compile_result.stderr}'
-
-            class_name = os.path.splitext(os.path.basename(file_path))[0]
-
-            result = subprocess.run(['java', '-cp', working_dir, class_name],
-                                    capture_output=True,
-                                    text=True,
-                                    timeout=20,
-                                    cwd=working_dir)
-
-            # Clean compiled class
-            try:
-                class_file = os.path.join(working_dir, f'{class_name}.class')
-                if os.path.exists(class_file):
-                    os.unlink(class_file)
-            except:
-                pass
+        time_limit = min(float(time_limit), 10.0)
+    except (TypeError, ValueError):
+        time_limit = None
+    # Also rejects NaN.
+    if time_limit is None or not time_limit > 0:
+        return Response({'error': 'time_limit must be a positive number of seconds'},
+                        status=status.HTTP_400_BAD_REQUEST)
 
-        else:
-            return 'Unsupported language'
+    try:
+        result = run_batch(code, language, cases, time_limit=time_limit)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except SandboxBusy as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': '2'})
 
-        output = result.stdout
-        if result.returncode != 0:
-            output += f'\nError (exit code {result.returncode}):\n{result.stderr}'
+    verdicts = [case['verdict'] for case in result['results']]
+    result['passed'] = verdicts.count('accepted')
+    result['total'] = len(cases)
+    return Response(result)
 
-        return output
 
-    except subprocess.TimeoutExpired:
-        return 'Execution timed out (limit: 30 seconds)'
-    except Exception as e:
-        return f'Execution error: {str(e)}'
+@transaction.non_atomic_requests
+@api_view(['GET'])
+def compile_cache_stats(request):
+    """
+    Hit/miss counters and current size of this worker's compile cache.
+    """
+    return Response(get_compile_cache().stats())
+
+
+@api_view(['POST'])
+def enqueue_code(request):
+    """
+    Queue code for the process_tasks worker and return the job id to poll.
+    """
+    code = request.data.get('code', '')
+    language = request.data.get('language', 'python')
+
+    if not code:
+        return Response({'error': 'No code provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = CodeJob.objects.create(code=code, language=language)
+    return Response({'job_id': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+def code_job(request, job_id):
+    """
+    Current status of a queued code job, with its output once finished.
+    """
+    job = get_object_or_404(CodeJob, id=job_id)
+    return Response(CodeJobSerializer(job).data)
+
+
+@transaction.non_atomic_requests
+@require_GET
+def code_job_stream(request, job_id):
+    """
+    Server-Sent Events feed of a code job: one event per status change,
+    ending with the finished job. Under WSGI, poll code_job instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Following a job would hold a sync worker for the whole stream.
+        return JsonResponse({'error': 'Job streams need the ASGI server; poll the job instead'}, status=501)
+    get_object_or_404(CodeJob, id=job_id)
+
+    def events():
+        deadline = time.monotonic() + CODE_JOB_STREAM_SECONDS
+        last_status = None
+        while True:
+            job = CodeJob.objects.get(id=job_id)
+            if job.status != last_status:
+                last_status = job.status
+                yield _sse(job.status, CodeJobSerializer(job).data)
+            if job.status in CodeJob.FINISHED or time.monotonic() > deadline:
+                return
+            time.sleep(0.5)
+
+    return _event_stream(request, events())
+
+
+@transaction.non_atomic_requests
+@require_GET
+def metrics_view(request):
+    """
+    This worker's request metrics in Prometheus text format.
+    """
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -3,6 +3,23 @@ ASGI config for quiz_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server, for example:
+
+    gunicorn quiz_backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+The async endpoints live under /api/async/ (quiz_api/async_views.py); use
+`python manage.py loadtest --url <wsgi> --url <asgi>` to compare deployments.
+The live leaderboard push channel, /api/async/leaderboard/stream/, is only
+served here: its subscribers wait on this event loop rather than each
+holding a WSGI worker.
+
+Django 4.2 runs each request's sync code (ORM calls included) in a thread
+of its own, and database connections belong to the thread that opened them.
+Persistent connections (DATABASE_CONN_MAX_AGE, SQLITE_CONN_MAX_AGE) would
+never be reused, only piled up, so this entry point sets DJANGO_ASGI and
+settings.py drops CONN_MAX_AGE to 0: every request closes its connections.
+Put PgBouncer in front of PostgreSQL to keep connecting cheap.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +29,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_backend.settings')
+os.environ['DJANGO_ASGI'] = 'True'
 
 application = get_asgi_application()
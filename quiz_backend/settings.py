@@ -1,4 +1,5 @@
 import os
+import tempfile
 import dj_database_url
 from pathlib import Path
 from dotenv import load_dotenv
@@ -124,11 +125,15 @@ DATABASES = {
     }
 }
 
+# Seconds a worker keeps its database connections open for reuse; always 0
+# under ASGI (see asgi.py).
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '600'))
+
 # Override database settings if DATABASE_URL is present (for production)
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
         conn_health_checks=True,
     )
     # Force database reset on deployment while preserving superuser
@@ -148,6 +153,67 @@ if 'DATABASE_URL' in os.environ:
                     password=user['password']
                 )
 
+# SQLite performance mode: WAL journaling (readers no longer block on the
+# writer), the pragmas below applied to every new connection and write
+# transactions that take the lock up front (both in the quiz_backend.sqlite3
+# backend), and persistent connections, so setup is paid once per worker
+# rather than once per request. Read-only views opt out of ATOMIC_REQUESTS in
+# views.py. WAL mode sticks to the database file, and SQLite keeps
+# db.sqlite3-wal/-shm files beside it (both git-ignored).
+SQLITE_PERFORMANCE_MODE = os.getenv('SQLITE_PERFORMANCE_MODE', 'True') == 'True'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    # Durable at every checkpoint; a power loss may drop the last commits
+    # but never corrupts the database.
+    'synchronous': 'normal',
+    'cache_size': -int(os.getenv('SQLITE_CACHE_KB', str(64 * 1024))),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_BYTES', str(256 * 1024 * 1024))),
+    'temp_store': 'memory',
+} if SQLITE_PERFORMANCE_MODE else {}
+if SQLITE_PERFORMANCE_MODE and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['ENGINE'] = 'quiz_backend.sqlite3'
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('SQLITE_CONN_MAX_AGE', '600'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Optional read replica. With DATABASE_REPLICA_URL set, reads are routed to
+# it and writes to the primary (quiz_api/routers.py); a client that wrote is
+# kept on the primary for REPLICA_PIN_SECONDS so it reads its own writes.
+# Connections to both persist for DATABASE_CONN_MAX_AGE seconds; set
+# DATABASE_PGBOUNCER=True when DATABASE_URL/DATABASE_REPLICA_URL point at a
+# PgBouncer in transaction pooling mode.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.parse(
+        os.environ['DATABASE_REPLICA_URL'],
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+    # The test runner should not create a second database for the replica.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['quiz_api.routers.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+                      'quiz_api.middleware.replica_pinning')
+if os.getenv('DATABASE_PGBOUNCER', 'False') == 'True':
+    for alias in DATABASES.values():
+        # Server-side cursors do not survive PgBouncer's transaction pooling.
+        alias['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Set by asgi.py. Each ASGI request runs its ORM calls in a new thread, so
+# connections kept open past the request would never be reused (see asgi.py).
+if os.getenv('DJANGO_ASGI', 'False') == 'True':
+    for alias in DATABASES.values():
+        alias['CONN_MAX_AGE'] = 0
+
+# Request metrics (quiz_api/metrics.py): every request is counted and timed
+# per route; METRICS_SAMPLE_RATE of them also get a query/span breakdown and
+# a Server-Timing header. /metrics requires `Authorization: Bearer
+# <METRICS_TOKEN>` when a token is set.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'quiz_api.middleware.request_metrics')
+
 # Static files configuration
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -160,3 +226,98 @@ STATICFILES_DIRS = [
 
 # Create static directory if it doesn't exist
 os.makedirs(os.path.join(BASE_DIR, 'static'), exist_ok=True)
+
+# Code sandbox (/api/compile/): warm runners per language, bounded concurrency
+# and a bounded wait queue; requests beyond the queue get a 503.
+SANDBOX_POOL_SIZE = int(os.getenv('SANDBOX_POOL_SIZE', '2'))
+SANDBOX_MAX_CONCURRENCY = int(os.getenv('SANDBOX_MAX_CONCURRENCY', '4'))
+SANDBOX_MAX_QUEUE = int(os.getenv('SANDBOX_MAX_QUEUE', '16'))
+SANDBOX_QUEUE_TIMEOUT = float(os.getenv('SANDBOX_QUEUE_TIMEOUT', '5'))
+
+# Compiled C/Java artifacts are cached on local disk, keyed by source hash,
+# and evicted least-recently-used once the directory outgrows this budget.
+SANDBOX_COMPILE_CACHE_DIR = os.getenv('SANDBOX_COMPILE_CACHE_DIR',
+                                      os.path.join(tempfile.gettempdir(), 'quiz-compile-cache'))
+SANDBOX_COMPILE_CACHE_MAX_BYTES = int(os.getenv('SANDBOX_COMPILE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+SANDBOX_MAX_BATCH_CASES = int(os.getenv('SANDBOX_MAX_BATCH_CASES', '50'))
+
+# Optional file shared by all worker processes for the pre-rendered question
+# bank and answer key; without it each process keeps its own in-memory copy
+# and rebuilds it every QUESTION_BANK_TTL seconds, so an admin edit made
+# through one worker reaches the others (and their grading) within that time.
+# Set the file when running several workers.
+QUESTION_BANK_CACHE_FILE = os.getenv('QUESTION_BANK_CACHE_FILE') or None
+QUESTION_BANK_TTL = float(os.getenv('QUESTION_BANK_TTL', '30'))
+
+# /api/leaderboard/ pages (?limit=&offset=, or ?after= from the Link header).
+# OFFSET costs as much as the rows it skips, so deeper pages need ?after=.
+LEADERBOARD_PAGE_SIZE = int(os.getenv('LEADERBOARD_PAGE_SIZE', '100'))
+LEADERBOARD_MAX_PAGE_SIZE = int(os.getenv('LEADERBOARD_MAX_PAGE_SIZE', '500'))
+LEADERBOARD_MAX_OFFSET = int(os.getenv('LEADERBOARD_MAX_OFFSET', '10000'))
+
+# Live leaderboard (/api/async/leaderboard/stream/, ASGI only): the top
+# LEADERBOARD_LIVE_SIZE rows, re-read at most once per LEADERBOARD_LIVE_TICK
+# seconds after a score change and at least every LEADERBOARD_LIVE_RESYNC
+# seconds. Streams end after LEADERBOARD_STREAM_SECONDS; clients reconnect.
+LEADERBOARD_LIVE_SIZE = int(os.getenv('LEADERBOARD_LIVE_SIZE', '100'))
+LEADERBOARD_LIVE_TICK = float(os.getenv('LEADERBOARD_LIVE_TICK', '1'))
+LEADERBOARD_LIVE_RESYNC = float(os.getenv('LEADERBOARD_LIVE_RESYNC', '5'))
+LEADERBOARD_STREAM_SECONDS = int(os.getenv('LEADERBOARD_STREAM_SECONDS', '300'))
+
+# Per-student question sets drawn by /api/quiz/start/ (quiz_api/quiz_sets.py):
+# QUIZ_QUESTION_COUNT questions (0: the whole bank, shuffled), including at
+# least the QUIZ_CATEGORY_QUOTAS questions per category, e.g. "python:5,sql:3".
+QUIZ_QUESTION_COUNT = int(os.getenv('QUIZ_QUESTION_COUNT', '0'))
+QUIZ_CATEGORY_QUOTAS = {
+    category.strip(): int(quota)
+    for category, quota in (item.split(':') for item in os.getenv('QUIZ_CATEGORY_QUOTAS', '').split(',') if item.strip())
+}
+
+# Upper bound on answers accepted by /api/submit-answers/ in one request.
+MAX_ANSWERS_PER_SUBMISSION = int(os.getenv('MAX_ANSWERS_PER_SUBMISSION', '500'))
+
+# Cached answer key and per-student answered sets for /api/submit-answer/
+# (quiz_api/answer_state.py). Process-local by default; point
+# ANSWER_STATE_CACHE_BACKEND/LOCATION at a shared backend (e.g. Redis) to
+# share entries between workers. Entries outlive a quiz session by design.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'answer_state': {
+        'BACKEND': os.getenv('ANSWER_STATE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('ANSWER_STATE_CACHE_LOCATION', 'answer-state'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('ANSWER_STATE_CACHE_MAX_ENTRIES', '10000'))},
+    },
+}
+ANSWER_STATE_CACHE = 'answer_state'
+ANSWER_STATE_TTL = int(os.getenv('ANSWER_STATE_TTL', str(2 * 60 * 60)))
+
+# Email (result notifications are sent by the process_tasks worker)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER or 'webmaster@localhost')
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', '50'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '5'))
+MAIL_RETRY_BASE_SECONDS = int(os.getenv('MAIL_RETRY_BASE_SECONDS', '60'))
+
+# Per-runner resource limits for submitted code. RLIMIT_NPROC counts every
+# process of the server's user, so keep SANDBOX_MAX_PROCESSES well above what
+# the web workers themselves use. SANDBOX_CGROUP may name a delegated cgroup v2
+# directory (with memory.max/pids.max set) that all runners are moved into.
+SANDBOX_CPU_SECONDS = int(os.getenv('SANDBOX_CPU_SECONDS', '10'))
+SANDBOX_MEMORY_BYTES = int(os.getenv('SANDBOX_MEMORY_BYTES', str(512 * 1024 * 1024)))
+SANDBOX_MAX_PROCESSES = int(os.getenv('SANDBOX_MAX_PROCESSES', '256'))
+# Java runners get their own, larger budgets: every JVM thread counts against
+# RLIMIT_NPROC, and the JVM reserves address space well beyond its heap
+# (which is capped at SANDBOX_MEMORY_BYTES with -Xmx).
+SANDBOX_JAVA_MAX_PROCESSES = int(os.getenv('SANDBOX_JAVA_MAX_PROCESSES', str(SANDBOX_MAX_PROCESSES + 256)))
+SANDBOX_JAVA_MEMORY_BYTES = int(os.getenv('SANDBOX_JAVA_MEMORY_BYTES',
+                                          str(SANDBOX_MEMORY_BYTES + 1536 * 1024 * 1024)))
+SANDBOX_MAX_FILE_BYTES = int(os.getenv('SANDBOX_MAX_FILE_BYTES', str(1024 * 1024)))
+SANDBOX_MAX_OUTPUT_BYTES = int(os.getenv('SANDBOX_MAX_OUTPUT_BYTES', str(64 * 1024)))
+SANDBOX_CGROUP = os.getenv('SANDBOX_CGROUP') or None
@@ -0,0 +1,27 @@
+"""
+SQLite backend for SQLITE_PERFORMANCE_MODE: tuned connections, and
+transactions opened with BEGIN IMMEDIATE.
+
+Every new connection gets settings.SQLITE_PRAGMAS (WAL journaling, cache
+and mmap sizes) before Django uses it.
+
+A deferred transaction that reads before it writes cannot wait for the
+write lock under WAL: if another connection committed in between, SQLite
+fails the upgrade with "database is locked" at once instead of honouring
+the busy timeout. Taking the write lock up front makes writers queue on
+the timeout instead. Read-only views run outside ATOMIC_REQUESTS and so
+never take it.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            connection.execute(f'PRAGMA {pragma} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -19,7 +19,7 @@ from django.urls import path, include
 from django.http import HttpResponse
 from quiz_api.views import complete_quiz, superuser_login, compile_code
 from django.contrib.auth.decorators import login_required
-from quiz_api import views
+from quiz_api import async_views, views
 
 
 def home(request):
@@ -32,10 +32,29 @@ urlpatterns = [
     # Our API endpoints:
     path('api/student/', views.create_student, name='create_student'),
     path('api/questions/', views.get_questions, name='get_questions'),
+    path('api/quiz/start/', views.start_quiz, name='start_quiz'),
     path('api/submit-answer/', views.submit_answer, name='submit_answer'),
+    path('api/submit-answers/', views.submit_answers, name='submit_answers'),
     path('api/leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/leaderboard/rank/<int:student_id>/', views.leaderboard_rank, name='leaderboard_rank'),
     path('api/delete-student/<int:pk>/', views.delete_student, name='delete_student'),
     path('api/login/', superuser_login, name='superuser_login'),  # ✅ Superuser login
     path('api/complete-quiz/', complete_quiz, name='complete_quiz'), 
-    path('api/compile/', compile_code, name='compile_code'),  
+    path('api/compile/', compile_code, name='compile_code'),
+    path('api/compile/stream/', views.compile_code_stream, name='compile_code_stream'),
+    path('api/compile/batch/', views.run_test_cases, name='run_test_cases'),
+    path('api/compile/cache/', views.compile_cache_stats, name='compile_cache_stats'),
+    path('api/compile/jobs/', views.enqueue_code, name='enqueue_code'),
+    path('api/compile/jobs/<uuid:job_id>/', views.code_job, name='code_job'),
+    path('api/compile/jobs/<uuid:job_id>/stream/', views.code_job_stream, name='code_job_stream'),
+
+    # Async versions of the hot endpoints, for ASGI deployments (see asgi.py):
+    path('api/async/questions/', async_views.get_questions, name='async_get_questions'),
+    path('api/async/submit-answer/', async_views.submit_answer, name='async_submit_answer'),
+    path('api/async/leaderboard/', async_views.leaderboard, name='async_leaderboard'),
+    path('api/async/leaderboard/stream/', async_views.leaderboard_stream, name='leaderboard_stream'),
+    path('api/async/compile/', async_views.compile_code, name='async_compile_code'),
+
+    # Prometheus scrape target (no trailing slash, as scrapers expect).
+    path('metrics', views.metrics_view, name='metrics'),
 ]